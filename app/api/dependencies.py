@@ -2,16 +2,13 @@ from typing import Generator, Optional
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import jwt, JWTError
-from pydantic import ValidationError
-from sqlalchemy.orm import Session
 
 from app.core import security
 from app.core.config import settings
-from app.db.session import get_db
+from app.db.session import DBSession, get_session
 from app.models.user import User
-from app.schemas.token import TokenData
-from app.services.user_service import user_service
+from app.schemas.token import TokenData, Principal
+from app.services.user_service import user_service, async_user_service
 
 reusable_oauth2 = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_V1_STR}/auth/login/access-token"
@@ -19,27 +16,23 @@ reusable_oauth2 = OAuth2PasswordBearer(
 
 def get_current_user_token(token: str = Depends(reusable_oauth2)) -> Optional[TokenData]:
     """
-    Decodes the JWT token.
+    Decodes the JWT token (served from security.token_cache when it was seen before).
     Raises HTTPException if token is invalid or expired.
     """
-    try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
-        token_data = TokenData(**payload)
-        return token_data
-    except (JWTError, ValidationError) as e:
-        # Log the error e
+    token_data = security.decode_token(token)
+    if token_data is None:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not validate credentials",
         )
+    return token_data
 
-def get_current_user(
-    db: Session = Depends(get_db), token_data: TokenData = Depends(get_current_user_token)
+async def get_current_user(
+    db: DBSession = Depends(get_session), token_data: TokenData = Depends(get_current_user_token)
 ) -> User:
     """
     Get the current user from the database based on the token's subject (email).
+    Served from the short-TTL principal cache when possible; user updates invalidate it.
     Raises HTTPException if user not found.
     """
     if token_data.sub is None:
@@ -47,9 +40,15 @@ def get_current_user(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Token subject is missing",
         )
-    user = user_service.get_by_email(db, email=token_data.sub)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    user = user_service.get_cached_principal(token_data.sub)
+    if user is None:
+        generation = user_service.principal_generation
+        user = await async_user_service.get_by_email(db, email=token_data.sub)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        user_service.cache_principal(user, generation)
+    if token_data.ver is not None and token_data.ver != (user.token_version or 0):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token has been revoked")
     return user
 
 def get_current_active_user(
@@ -63,30 +62,56 @@ def get_current_active_user(
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
-# Dependency for superuser/admin (example)
-# def get_current_active_superuser(
-#     current_user: User = Depends(get_current_active_user),
-# ) -> User:
-#     """
-#     Get the current active superuser.
-#     Raises HTTPException if the user is not a superuser.
-#     """
-#     if not user_service.is_superuser(current_user):
-#         raise HTTPException(
-#             status_code=403, detail="The user doesn't have enough privileges"
-#         )
-#     return current_user
+async def get_current_principal(
+    db: DBSession = Depends(get_session), token_data: TokenData = Depends(get_current_user_token)
+) -> Principal:
+    """
+    Get the authenticated identity. Role, status and token version are the user's current values:
+    they come from the principal cache (user updates write the new values into it) or, on a miss,
+    from one user query. The token only carries its version (`ver`), checked against the user's.
+    A revoked token (users.token_version bumped) or a deactivated user is refused at once by this
+    worker, and by the others once their entry expires (AUTH_PRINCIPAL_CACHE_TTL_SECONDS).
+    """
+    user = await get_current_user(db=db, token_data=token_data)
+    return Principal(
+        id=user.id, email=user.email, role=user.role, status=user.status, token_version=user.token_version or 0
+    )
+
+def get_current_active_principal(
+    principal: Principal = Depends(get_current_principal)
+) -> Principal:
+    """
+    Get the current active principal.
+    Raises HTTPException if the user is inactive.
+    """
+    if principal.status != "active":
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return principal
+
+# Dependency for superuser/admin
+def get_current_active_superuser(
+    principal: Principal = Depends(get_current_active_principal),
+) -> Principal:
+    """
+    Get the current active superuser.
+    Raises HTTPException if the user is not a superuser.
+    """
+    if not user_service.is_superuser(principal):
+        raise HTTPException(
+            status_code=403, detail="The user doesn't have enough privileges"
+        )
+    return principal
 
 # Dependency for optional user (if token is provided, get user, else None)
 async def get_optional_current_user(
-    db: Session = Depends(get_db), token: Optional[str] = Depends(reusable_oauth2)
+    db: DBSession = Depends(get_session), token: Optional[str] = Depends(reusable_oauth2)
 ) -> Optional[User]:
     if not token:
         return None
     try:
         token_data = get_current_user_token(token) # This itself can raise HTTPException
         if token_data and token_data.sub:
-            user = user_service.get_by_email(db, email=token_data.sub)
+            user = await async_user_service.get_by_email(db, email=token_data.sub)
             return user
     except HTTPException as e:
         # If token is invalid (e.g. expired, malformed), treat as no user
@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from app.api.v1.endpoints import users, products, auth, categories
+from app.api.v1.endpoints import users, products, auth, categories, monitoring, media
 
 api_router = APIRouter()
 
@@ -8,3 +8,5 @@ api_router.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 api_router.include_router(users.router, prefix="/users", tags=["Users"])
 api_router.include_router(products.router, prefix="/products", tags=["Products"])
 api_router.include_router(categories.router, prefix="/categories", tags=["Categories"])
+api_router.include_router(media.router, prefix="/media", tags=["Media"])
+api_router.include_router(monitoring.router, prefix="/monitoring", tags=["Monitoring"])
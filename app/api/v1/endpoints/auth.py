@@ -2,27 +2,27 @@ from datetime import timedelta
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm # For standard form login
-from sqlalchemy.orm import Session
 
 from app import schemas # Import all schemas from the __init__
 from app.services import user_service # Import the instantiated service
+from app.services.user_service import async_user_service
 from app.core import security # For token creation and password hashing
 from app.core.config import settings
-from app.db.session import get_db
+from app.db.session import DBSession, get_session
 from app.api import dependencies # For getting current user
 
 router = APIRouter()
 
 @router.post("/login/access-token", response_model=schemas.Token)
 async def login_for_access_token(
-    db: Session = Depends(get_db),
+    db: DBSession = Depends(get_session),
     form_data: OAuth2PasswordRequestForm = Depends() # Standard OAuth2 form
 ):
     """
     OAuth2 compatible token login, get an access token for future requests.
     Uses email as username.
     """
-    user = user_service.authenticate(db, email=form_data.username, password=form_data.password)
+    user = await async_user_service.authenticate(db, email=form_data.username, password=form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, # Correct status for failed login
@@ -32,14 +32,15 @@ async def login_for_access_token(
     if not user_service.is_active(user):
         raise HTTPException(status_code=400, detail="Inactive user")
 
+    claims = user_service.token_claims(user) if settings.JWT_PRINCIPAL_CLAIMS else None
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = security.create_access_token(
-        subject=user.email, expires_delta=access_token_expires
+        subject=user.email, expires_delta=access_token_expires, claims=claims
     )
 
     refresh_token_expires = timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
     refresh_token = security.create_refresh_token(
-        subject=user.email, expires_delta=refresh_token_expires
+        subject=user.email, expires_delta=refresh_token_expires, claims=claims
     )
 
     return {
@@ -51,7 +52,7 @@ async def login_for_access_token(
 @router.post("/token/refresh", response_model=schemas.Token)
 async def refresh_access_token(
     refresh_token_data: schemas.RefreshToken, # Expect a JSON body with "refresh_token"
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_session)
 ):
     """
     Refresh an access token using a refresh token.
@@ -64,7 +65,7 @@ async def refresh_access_token(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    user = user_service.get_by_email(db, email=token_payload.sub)
+    user = await async_user_service.get_by_email(db, email=token_payload.sub)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -73,10 +74,17 @@ async def refresh_access_token(
         )
     if not user_service.is_active(user):
         raise HTTPException(status_code=400, detail="Inactive user")
+    if token_payload.ver is not None and token_payload.ver != (user.token_version or 0):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Refresh token has been revoked",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
 
+    claims = user_service.token_claims(user) if settings.JWT_PRINCIPAL_CLAIMS else None
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     new_access_token = security.create_access_token(
-        subject=user.email, expires_delta=access_token_expires
+        subject=user.email, expires_delta=access_token_expires, claims=claims
     )
     return {
         "access_token": new_access_token,
@@ -89,7 +97,7 @@ async def refresh_access_token(
 @router.post("/register", response_model=schemas.User)
 async def register_user(
     user_in: schemas.UserCreate,
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_session)
 ):
     """
     Create new user.
@@ -97,7 +105,7 @@ async def register_user(
     # The user_service.create method already handles checking for existing email
     # and raises HTTPException if user exists.
     try:
-        new_user = user_service.create(db, obj_in=user_in)
+        new_user = await async_user_service.create(db, obj_in=user_in)
         return new_user
     except HTTPException as e:
         # Re-raise the HTTPException from the service layer
@@ -120,9 +128,9 @@ async def read_users_me(
     return current_user
 
 @router.post("/change-password", summary="Change password for current user")
-def change_password(
+async def change_password(
     new_password: str,
-    db: Session = Depends(get_db),
+    db: DBSession = Depends(get_session),
     current_user: schemas.User = Depends(dependencies.get_current_active_user),
 ):
     if not new_password or len(new_password) < 6:
@@ -130,7 +138,7 @@ def change_password(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Password must be at least 6 characters."
         )
-    user_service.update(
+    await async_user_service.update(
         db,
         db_obj=current_user,
         obj_in={"password": new_password}
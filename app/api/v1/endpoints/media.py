@@ -0,0 +1,75 @@
+import asyncio
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.db.session import DBSession, get_session
+from app.services.product_service import async_product_service
+from app.utils.disk_cache import DiskLRUCache
+from app.utils.images import IMAGE_FORMATS, image_executor, resize_cache, resize_image
+from app.utils.storage import get_storage
+
+router = APIRouter()
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    candidates = [tag[2:] if tag.startswith("W/") else tag for tag in candidates]
+    return "*" in candidates or etag in candidates
+
+
+@router.get("/resize/{image_id}")
+async def resize_product_image(
+    image_id: int,
+    request: Request,
+    w: Optional[int] = Query(None, description="Max width (px); must be one of IMAGE_RESIZE_SIZES"),
+    h: Optional[int] = Query(None, description="Max height (px); must be one of IMAGE_RESIZE_SIZES"),
+    fmt: Literal["jpeg", "webp"] = Query("webp"),
+    db: DBSession = Depends(get_session),
+):
+    """
+    A product image fitted into w x h (aspect ratio kept, never upscaled), in jpeg or webp.
+    Resized from the stored original on first request and kept in a size-bounded disk LRU cache;
+    responses carry a strong ETag and immutable cache headers.
+    """
+    allowed = settings.image_resize_sizes
+    if w is None and h is None:
+        raise HTTPException(status_code=400, detail="w or h is required")
+    for value in (w, h):
+        if value is not None and value not in allowed:
+            raise HTTPException(status_code=400, detail=f"Size not allowed, use one of {allowed}")
+
+    image = await async_product_service.get_product_image(db, image_id=image_id)
+    if image is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    if not image.storage_key:
+        raise HTTPException(status_code=404, detail="Image is not in the media storage")
+
+    filename = DiskLRUCache.filename(
+        f"{image.storage_key}|{w}|{h}|{fmt}|{settings.IMAGE_QUALITY}", IMAGE_FORMATS[fmt][1]
+    )
+    etag = f'"{filename.split(".")[0]}"'
+    # The output for a given storage key, size and format never changes (same lifetime as MediaFiles)
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={settings.MEDIA_IMMUTABLE_MAX_AGE}, immutable"}
+    if etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    content = await run_in_threadpool(resize_cache.read, filename)
+    if content is None:
+        storage = get_storage()
+        source = storage.local_path(image.storage_key)
+        if source is None:
+            source = await run_in_threadpool(storage.open, image.storage_key)
+        try:
+            content = await image_executor.run(resize_image, source, w, h, fmt, settings.IMAGE_QUALITY)
+        except ValueError:
+            raise HTTPException(status_code=404, detail="Image file not found or unreadable")
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Image processing timed out")
+        await run_in_threadpool(resize_cache.put, filename, content)
+    return Response(content, media_type=f"image/{fmt}", headers=headers)
@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Depends
+from typing import Any, Dict
+
+from app.api.dependencies import get_current_active_superuser
+from app.utils.cache import caches
+from app.utils.executor import executors
+from app.utils.search import indexes
+
+# Cache and pool internals are for operators only
+router = APIRouter(dependencies=[Depends(get_current_active_superuser)])
+
+@router.get("/caches")
+async def read_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Hit/miss/eviction counters of the in-process caches of this worker.
+    """
+    return {name: cache.stats() for name, cache in caches.items()}
+
+@router.get("/executors")
+async def read_executor_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Queue depth and job counters of the bounded worker pools of this worker.
+    """
+    return {name: executor.stats() for name, executor in executors.items()}
+
+@router.get("/search-indexes")
+async def read_search_index_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Size, search and rebuild counters of the in-memory search indexes of this worker.
+    """
+    return {name: index.stats() for name, index in indexes.items()}
@@ -1,38 +1,41 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Body, status, UploadFile, File, Form
-from sqlalchemy.orm import Session
-from typing import List, Optional, Any
-import os
-import base64
-from PIL import Image, UnidentifiedImageError
-import io
+from fastapi import APIRouter, Depends, HTTPException, Query, Body, Response, status, UploadFile, File, Form
+from typing import Any, Dict, List, Literal, Optional, Tuple
+import asyncio
+from pydantic import TypeAdapter, ValidationError
+from starlette.concurrency import run_in_threadpool
 
 from app import schemas
-from app.services import product_service, category_service # Assuming category_service exists for validation
-from app.db.session import get_db
+from app.services.product_service import PRODUCT_FACETS, product_service, async_product_service
+from app.services.category_service import async_category_service # For category validation
+from app.core.config import settings
+from app.db.session import DBSession, get_session
 from app.api import dependencies # For authentication/authorization
-from app.models.user import User # To type hint current_user
-from app.api.dependencies import get_current_active_user  # Ajusta el path si tu dependencia está en otro módulo
+from app.api.dependencies import get_current_active_principal  # Ajusta el path si tu dependencia está en otro módulo
 from app.schemas.product_image import ProductImageCreate
+from app.core.uploads import UploadRoute
+from app.utils.images import hash_upload, image_executor, render_derivatives, save_renditions
+from app.utils.executor import ExecutorSaturatedError
+from app.utils.storage import get_storage
 
-router = APIRouter()
+router = APIRouter(route_class=UploadRoute) # Uploads: IMAGE_MAX_UPLOAD_BYTES per file, enforced while receiving
 
 @router.post(
     "/",
     response_model=schemas.Product,
     status_code=status.HTTP_201_CREATED,
-    dependencies=[Depends(dependencies.get_current_active_user)] # Example: Require user to be logged in
+    dependencies=[Depends(dependencies.get_current_active_principal)] # Example: Require user to be logged in
 )
 async def create_product(
     product_in: schemas.ProductCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(dependencies.get_current_active_user) # Get the user
+    db: DBSession = Depends(get_session),
+    current_user: schemas.Principal = Depends(dependencies.get_current_active_principal) # Get the user
 ):
     """
     Create a new product.
     Requires authentication.
     """
     # Validate category_id
-    category = category_service.get(db, id=product_in.category_id)
+    category = await async_category_service.get(db, id=product_in.category_id)
     if not category:
         raise HTTPException(status_code=400, detail=f"Category with id {product_in.category_id} not found.")
 
@@ -42,7 +45,7 @@ async def create_product(
     #     raise HTTPException(status_code=400, detail=f"Product with SKU {product_in.sku} already exists.")
 
     try:
-        return product_service.create(db=db, obj_in=product_in, created_by_user_id=current_user.id)
+        return await async_product_service.create(db=db, obj_in=product_in, created_by_user_id=current_user.id)
     except Exception as e: # Catch potential IntegrityErrors from slug/sku uniqueness or other DB issues
         # Log e
         raise HTTPException(status_code=400, detail=f"Could not create product. Error: {str(e)}")
@@ -50,80 +53,179 @@ async def create_product(
 
 @router.get("/", response_model=schemas.ProductPaginated)
 async def read_products(
-    db: Session = Depends(get_db),
+    db: DBSession = Depends(get_session),
     skip: int = Query(0, ge=0, alias="page_offset"), # ge=0 means greater than or equal to 0
     limit: int = Query(10, ge=1, le=100, alias="page_limit"), # le=100 means less than or equal to 100
     category_id: Optional[int] = Query(None),
     status_filter: Optional[schemas.ProductStatus] = Query(None, alias="status"), # Use the Literal type
-    featured: Optional[bool] = Query(None)
-    # Add more filters like search_term, price_min, price_max, etc.
+    featured: Optional[bool] = Query(None),
+    price_min: Optional[float] = Query(None, ge=0, description="Minimum price paid (sale_price, else base_price)"),
+    price_max: Optional[float] = Query(None, ge=0, description="Maximum price paid (sale_price, else base_price)"),
+    sort: Optional[schemas.ProductSort] = Query(None, description="Ordering (default -id, newest first); not with q"),
+    cursor: Optional[str] = Query(None, description="Keyset pagination: next_cursor of the previous page (empty for the first page)"),
+    view: Literal["full", "summary"] = Query("full", description="'summary' returns ProductSummary items without images/variants"),
+    q: Optional[str] = Query(None, min_length=1, max_length=200, description="Full-text search; results are ordered by relevance"),
+    mode: Literal["natural", "boolean"] = Query("natural", description="Search mode for SEARCH_BACKEND=fulltext"),
+    facets: Optional[str] = Query(None, description="Comma-separated facets to count: category_id,status,visibility,featured,price,tags")
 ):
     """
     Retrieve a paginated list of products.
-    Optionally filter by category_id, status, featured status.
+    Optionally filter by category_id, status, featured status and price range.
+    `sort` orders by price, name or date; every ordering can be paged by cursor.
+    Pass `cursor` to page by keyset instead of page_offset; its cost does not grow with page depth.
+    Offset pages also return a next_cursor, so a client can switch to cursor mode at any point.
+    With view=summary the items are schemas.ProductSummary (no images/variants are loaded).
+    With `q` the list is a search (see /products/search): ordered by relevance, offset pages only.
+    With `facets` the response also counts the products matching the filters per value of each
+    facet (one query; price buckets per PRODUCT_PRICE_FACET_BOUNDS).
     """
     filters = {
         "category_id": category_id,
         "status": status_filter,
-        "featured": featured
+        "featured": featured,
+        "price_min": price_min,
+        "price_max": price_max,
     }
     # Remove None filters to avoid passing them to the service if not set
     active_filters = {k: v for k, v in filters.items() if v is not None}
+    with_details = view == "full"
+    facet_names = [name.strip() for name in facets.split(",") if name.strip()] if facets else []
+    unknown = [name for name in facet_names if name not in PRODUCT_FACETS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown facets: {', '.join(unknown)}")
+    if facet_names and q is not None and settings.SEARCH_BACKEND != "fulltext":
+        raise HTTPException(status_code=400, detail="Facets of search results need SEARCH_BACKEND=fulltext")
 
-    products, total = product_service.get_multi_paginated(db, skip=skip, limit=limit, filters=active_filters)
-    return schemas.ProductPaginated(
-        total=total,
-        items=products,
-        page=(skip // limit) + 1 if limit > 0 else 1, # Calculate current page
-        size=limit
+    if q is not None:
+        if cursor is not None:
+            raise HTTPException(status_code=400, detail="Search results are paged with page_offset, not cursor")
+        if sort is not None:
+            raise HTTPException(status_code=400, detail="Search results are ordered by relevance, not sort")
+        products, total = await async_product_service.search(
+            db, q=q, mode=mode, skip=skip, limit=limit, filters=active_filters, with_details=with_details
+        )
+        page = (skip // limit) + 1
+        next_cursor = None
+    elif cursor is not None:
+        try:
+            products, total, next_cursor = await async_product_service.get_multi_by_cursor(
+                db, limit=limit, cursor=cursor, filters=active_filters, sort=sort or "-id", with_details=with_details
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid cursor: {e}")
+        page = None
+    else:
+        products, total = await async_product_service.get_multi_paginated(
+            db, skip=skip, limit=limit, filters=active_filters, sort=sort or "-id", with_details=with_details
+        )
+        page = (skip // limit) + 1 if limit > 0 else 1 # Calculate current page
+        next_cursor = None
+        if products and skip + len(products) < total:
+            next_cursor = product_service.get_next_cursor(products[-1], sort=sort or "-id")
+
+    paginated_schema = schemas.ProductPaginated if with_details else schemas.ProductSummaryPaginated
+    facet_counts = None
+    if facet_names:
+        facet_filters = {**active_filters, "search": q, "search_mode": mode} if q is not None else active_filters
+        facet_counts = await async_product_service.get_facets(
+            db, facets=list(dict.fromkeys(facet_names)), filters=facet_filters
+        )
+    result = paginated_schema(
+        total=total, items=products, page=page, size=limit, next_cursor=next_cursor, facets=facet_counts
+    )
+    if not with_details:
+        # Bypass response_model (full Product items) so the slim items are sent as they are
+        return Response(content=result.model_dump_json(), media_type="application/json")
+    return result
+
+@router.get("/search", response_model=schemas.ProductPaginated)
+async def search_products(
+    q: str = Query(..., min_length=1, max_length=200, description="Words to look for (accents and case are ignored)"),
+    db: DBSession = Depends(get_session),
+    skip: int = Query(0, ge=0, alias="page_offset"),
+    limit: int = Query(10, ge=1, le=100, alias="page_limit"),
+    category_id: Optional[int] = Query(None),
+    status_filter: Optional[schemas.ProductStatus] = Query(None, alias="status"),
+    featured: Optional[bool] = Query(None),
+    price_min: Optional[float] = Query(None, ge=0),
+    price_max: Optional[float] = Query(None, ge=0),
+    view: Literal["full", "summary"] = Query("full", description="'summary' returns ProductSummary items without images/variants"),
+    mode: Literal["natural", "boolean"] = Query(
+        "natural", description="SEARCH_BACKEND=fulltext only: MySQL natural-language or boolean mode (+word -word \"phrase\" word*)"
+    )
+):
+    """
+    Full-text product search, best match first. Takes the filters and paging parameters of the
+    product list (offset paging only).
+    SEARCH_BACKEND=memory (default): BM25 over name, descriptions, tags, keywords, SKU and barcode,
+    served from an in-process index; writes made through other workers show up within SEARCH_INDEX_SYNC_SECONDS.
+    SEARCH_BACKEND=fulltext: MySQL MATCH ... AGAINST on the FULLTEXT index (name, short and long description).
+    """
+    filters = {
+        "category_id": category_id, "status": status_filter, "featured": featured,
+        "price_min": price_min, "price_max": price_max,
+    }
+    with_details = view == "full"
+    products, total = await async_product_service.search(
+        db, q=q, mode=mode, skip=skip, limit=limit, filters=filters, with_details=with_details
     )
+    paginated_schema = schemas.ProductPaginated if with_details else schemas.ProductSummaryPaginated
+    result = paginated_schema(total=total, items=products, page=(skip // limit) + 1, size=limit)
+    if not with_details:
+        return Response(content=result.model_dump_json(), media_type="application/json")
+    return result
 
 @router.get("/{product_id_or_slug}", response_model=schemas.Product)
 async def read_product(
     product_id_or_slug: str, # Can be int (ID) or str (slug)
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_session)
 ):
     """
     Retrieve a single product by its ID or slug.
+    Served from the product detail cache when possible (invalidated by product/image writes).
     """
-    db_product: Optional[schemas.Product] = None
-    if product_id_or_slug.isdigit():
-        db_product = product_service.get(db, id=int(product_id_or_slug))
-    else:
-        db_product = product_service.get_product_by_slug(db, slug=product_id_or_slug)
+    body = product_service.get_cached_detail(product_id_or_slug)
+    if body is None:
+        generation = product_service.detail_generation
+        db_product: Optional[schemas.Product] = None
+        if product_id_or_slug.isdigit():
+            db_product = await async_product_service.get(db, id=int(product_id_or_slug))
+        else:
+            db_product = await async_product_service.get_product_by_slug(db, slug=product_id_or_slug)
 
-    if db_product is None:
-        raise HTTPException(status_code=404, detail="Product not found")
-    return db_product
+        if db_product is None:
+            raise HTTPException(status_code=404, detail="Product not found")
+        body = product_service.cache_detail(db_product, generation)
+    return Response(content=body, media_type="application/json")
 
 @router.put(
     "/{product_id}",
     response_model=schemas.Product,
-    dependencies=[Depends(dependencies.get_current_active_user)] # Example: Require user to be logged in
+    dependencies=[Depends(dependencies.get_current_active_principal)] # Example: Require user to be logged in
 )
 async def update_product(
     product_id: int,
     product_in: schemas.ProductUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(dependencies.get_current_active_user) # Get the user
+    db: DBSession = Depends(get_session),
+    current_user: schemas.Principal = Depends(dependencies.get_current_active_principal) # Get the user
 ):
     """
     Update an existing product.
     Requires authentication.
     """
-    db_product = product_service.get(db, id=product_id)
+    db_product = await async_product_service.get(db, id=product_id)
     if not db_product:
         raise HTTPException(status_code=404, detail="Product not found")
 
     if product_in.category_id:
-        category = category_service.get(db, id=product_in.category_id)
+        category = await async_category_service.get(db, id=product_in.category_id)
         if not category:
             raise HTTPException(status_code=400, detail=f"Category with id {product_in.category_id} not found.")
 
     # Add more validation as needed (e.g., SKU uniqueness if changed)
 
     try:
-        return product_service.update(db=db, db_obj=db_product, obj_in=product_in, last_modified_by_user_id=current_user.id)
+        return await async_product_service.update(db=db, db_obj=db_product, obj_in=product_in, last_modified_by_user_id=current_user.id)
     except Exception as e:
         # Log e
         raise HTTPException(status_code=400, detail=f"Could not update product. Error: {str(e)}")
@@ -132,22 +234,22 @@ async def update_product(
 @router.delete(
     "/{product_id}",
     response_model=schemas.Product,  # O un mensaje de éxito
-    dependencies=[Depends(dependencies.get_current_active_user)]
+    dependencies=[Depends(dependencies.get_current_active_principal)]
 )
 async def deactivate_product_by_id(
     product_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(dependencies.get_current_active_user) # Ensure user is logged in
+    db: DBSession = Depends(get_session),
+    current_user: schemas.Principal = Depends(dependencies.get_current_active_principal) # Ensure user is logged in
 ):
     """
     Deactivate a product (soft delete).
     Changes product status to 'inactive' instead of deleting from DB.
     """
-    product_to_deactivate = product_service.get(db, id=product_id)
+    product_to_deactivate = await async_product_service.get(db, id=product_id)
     if not product_to_deactivate:
         raise HTTPException(status_code=404, detail="Product not found")
 
-    updated_product = product_service.update(db, db_obj=product_to_deactivate, obj_in={"status": "inactive"})
+    updated_product = await async_product_service.update(db, db_obj=product_to_deactivate, obj_in={"status": "inactive"})
     return updated_product
 
 
@@ -155,17 +257,34 @@ async def deactivate_product_by_id(
 @router.delete(
     "/images/{image_id}",
     response_model=schemas.ProductImage,
-    dependencies=[Depends(dependencies.get_current_active_user)]
+    dependencies=[Depends(dependencies.get_current_active_principal)]
 )
 async def delete_product_image_from_product(
     image_id: int,
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_session)
 ):
-    deleted_image = product_service.remove_product_image(db, image_id=image_id)
+    deleted_image = await async_product_service.remove_product_image(db, image_id=image_id)
     if not deleted_image:
         raise HTTPException(status_code=404, detail="Image not found")
     return deleted_image
 
+async def render_upload(upload_path: str) -> Tuple[bytes, Dict[str, Dict[int, bytes]], Optional[str]]:
+    """
+    Re-encode an uploaded file (the path of its temp file) on the image pool. Returns the full-size JPEG,
+    its derivatives and the placeholder; they are stored (save_renditions) under the upload's content hash
+    once its MediaBlob is locked (see CRUDProduct.lock_upload_blobs).
+    """
+    try:
+        jpeg_content, renditions, placeholder = await image_executor.run(
+            render_derivatives, upload_path, settings.image_derivative_widths, settings.image_derivative_formats,
+            settings.IMAGE_QUALITY, settings.IMAGE_MAX_DIMENSION, settings.IMAGE_PLACEHOLDER_SIZE
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Unsupported image format")
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Image processing timed out")
+    return jpeg_content, renditions, placeholder
+
 @router.post("/{product_id}/images", status_code=status.HTTP_201_CREATED, response_model=schemas.ProductImage)
 async def upload_product_image(
     product_id: int,
@@ -173,56 +292,189 @@ async def upload_product_image(
     is_main: bool = Form(False),
     alt: Optional[str] = Form(None),
     display_order: Optional[int] = Form(0),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: DBSession = Depends(get_session),
+    current_user: schemas.Principal = Depends(get_current_active_principal)
 ):
     """
     Upload an image for a product.
     Expects multipart/form-data with 'image' (file), 'is_main' (bool), 'alt' (str, optional), 'display_order' (int, optional).
+    The image is re-encoded as JPEG and stored in the media storage, together with resized
+    JPEG/WebP copies (IMAGE_DERIVATIVE_*), exposed as `srcset`, and a tiny blurred `placeholder`
+    (data URL) to show while it loads; the ProductImage keeps only URLs/keys.
+    A file identical to an earlier upload reuses its stored copy (reference counted) without processing.
     """
-    product = product_service.get(db, id=product_id)
+    product = await async_product_service.get(db, id=product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
 
-    # Leer el archivo original
-    original_content = await image.read()
-    input_stream = io.BytesIO(original_content)
+    # The file was capped at IMAGE_MAX_UPLOAD_BYTES while received and written to a named temp file
+    # (UploadRoute); the image pool reads it from there
+    content_hash = await run_in_threadpool(hash_upload, image.file)
+    # The same file was uploaded before: reference its stored copy, no processing
+    db_image = await async_product_service.add_product_image_from_blob(
+        db, product=product, content_hash=content_hash, alt=alt, display_order=display_order, is_main=is_main
+    )
+    if db_image is not None:
+        return db_image
+    jpeg_content, renditions, placeholder = await render_upload(image.file.name)
+
+    # Held until the image is committed: removals and other uploads of this file wait for it
+    blob = (await async_product_service.lock_upload_blobs(db, content_hashes=[content_hash]))[content_hash]
+    if blob.ref_count:
+        # A concurrent upload of the same file registered it while this one was rendering
+        return await async_product_service.add_product_image_from_blob(
+            db, product=product, content_hash=content_hash, alt=alt, display_order=display_order, is_main=is_main
+        )
+    storage = get_storage()
     try:
-        img = Image.open(input_stream)
-        if img.mode in ("RGBA", "LA"):
-            img = img.convert("RGB")
-        output_stream = io.BytesIO()
-        img.save(output_stream, format="JPEG", quality=70)
-        compressed_content = output_stream.getvalue()
-        image_base64 = base64.b64encode(compressed_content).decode("utf-8")
-        mime_type = "image/jpeg"
-    except UnidentifiedImageError:
-        # Si el formato no es soportado, guarda el archivo original en base64
-        image_base64 = base64.b64encode(original_content).decode("utf-8")
-        mime_type = image.content_type or "application/octet-stream"
-    data_url = f"data:{mime_type};base64,{image_base64}"
+        storage_key, derivatives = await run_in_threadpool(save_renditions, storage, jpeg_content, renditions, content_hash)
+    except Exception:
+        await async_product_service.abandon_uploads(db, uploads={})
+        raise
 
     image_in = ProductImageCreate(
-        url=data_url,
+        url=storage.url(storage_key),
         alt=alt,
         display_order=display_order,
         is_main=is_main
     )
+    return await async_product_service.add_product_image(
+        db, product=product, image_in=image_in, storage_key=storage_key, derivatives=derivatives,
+        content_hash=content_hash, placeholder=placeholder
+    )
 
-    db_image = product_service.add_product_image(db, product=product, image_in=image_in)
-    return db_image
+upload_metadata_adapter = TypeAdapter(List[schemas.ProductImageUploadMeta])
+
+@router.post("/{product_id}/images/batch", response_model=schemas.ProductImageBatchUpload)
+async def upload_product_images(
+    product_id: int,
+    images: List[UploadFile] = File(...),
+    metadata: Optional[str] = Form(None),
+    db: DBSession = Depends(get_session),
+    current_user: schemas.Principal = Depends(get_current_active_principal)
+):
+    """
+    Upload several images for a product in one request.
+    Expects multipart/form-data with one or more 'images' files and an optional 'metadata' field:
+    a JSON list of {"alt", "display_order", "is_main"} objects, one per file in the same order
+    (display_order defaults to the file's position). New files are processed concurrently on the
+    image pool, files already stored are reused, and all images are inserted in one transaction.
+    A file that fails (not an image, processing timeout, pool full) does not stop the others; the
+    response reports the status of each file. A file over IMAGE_MAX_UPLOAD_BYTES fails the request (413).
+    """
+    if len(images) > settings.IMAGE_BATCH_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"At most {settings.IMAGE_BATCH_MAX_FILES} files per batch")
+    try:
+        files_meta = upload_metadata_adapter.validate_json(metadata) if metadata else []
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+    if len(files_meta) > len(images):
+        raise HTTPException(status_code=422, detail="metadata has more entries than there are files")
+    files_meta += [schemas.ProductImageUploadMeta() for _ in range(len(images) - len(files_meta))]
+    if not await async_product_service.exists(db, id=product_id):
+        raise HTTPException(status_code=404, detail="Product not found")
+
+    failures: Dict[int, str] = {}
+    uploads: Dict[int, Tuple[str, str]] = {} # index -> (temp file path, content hash)
+    rendered: Dict[str, Tuple[bytes, Dict[str, Dict[int, bytes]], Optional[str]]] = {}
+    for index, image in enumerate(images):
+        uploads[index] = (image.file.name, await run_in_threadpool(hash_upload, image.file))
+
+    # Render each distinct new file once; at most IMAGE_WORKERS jobs of this batch hold the pool
+    stored = await async_product_service.get_stored_hashes(
+        db, content_hashes=list({content_hash for _, content_hash in uploads.values()})
+    )
+    to_render: Dict[str, str] = {}
+    for upload_path, content_hash in uploads.values():
+        if content_hash not in stored:
+            to_render.setdefault(content_hash, upload_path)
+    slots = asyncio.Semaphore(settings.IMAGE_WORKERS)
+
+    async def render(upload_path: str, content_hash: str):
+        async with slots:
+            return await render_upload(upload_path)
+
+    outcomes = await asyncio.gather(
+        *(render(upload_path, content_hash) for content_hash, upload_path in to_render.items()),
+        return_exceptions=True
+    )
+    render_errors: Dict[str, str] = {}
+    unexpected: Optional[BaseException] = None
+    for content_hash, outcome in zip(to_render, outcomes):
+        if isinstance(outcome, HTTPException):
+            render_errors[content_hash] = outcome.detail
+        elif isinstance(outcome, ExecutorSaturatedError):
+            render_errors[content_hash] = "Image processing is busy, retry later"
+        elif isinstance(outcome, BaseException):
+            unexpected = unexpected or outcome
+        else:
+            rendered[content_hash] = outcome
+
+    # Files are stored and registered under the locks of their blobs, taken for every hash of the
+    # batch at once (in hash order, like any other request); they are held until the commit
+    written: Dict[str, Tuple[str, Dict[str, Dict[str, str]]]] = {}
+    try:
+        if unexpected is not None:
+            raise unexpected
+        content_hashes = [content_hash for _, content_hash in uploads.values() if content_hash not in render_errors]
+        blobs = await async_product_service.lock_upload_blobs(db, content_hashes=content_hashes)
+        storage = get_storage()
+        for content_hash, (jpeg_content, renditions, _) in rendered.items():
+            if not blobs[content_hash].ref_count: # Else registered by a concurrent upload meanwhile
+                written[content_hash] = await run_in_threadpool(save_renditions, storage, jpeg_content, renditions, content_hash)
+    except Exception:
+        # Nothing was registered: remove the files this request stored
+        await async_product_service.abandon_uploads(db, uploads=written)
+        raise
+
+    entries: List[Dict[str, Any]] = []
+    entry_indexes: List[int] = []
+    for index, (_, content_hash) in uploads.items():
+        if content_hash in render_errors:
+            failures[index] = render_errors[content_hash]
+            continue
+        storage_key, derivatives = written.get(content_hash, (None, None))
+        meta = files_meta[index]
+        entries.append({
+            "content_hash": content_hash, "storage_key": storage_key, "derivatives": derivatives,
+            "placeholder": rendered[content_hash][2] if content_hash in written else None, "alt": meta.alt,
+            "display_order": index if meta.display_order is None else meta.display_order, "is_main": meta.is_main,
+        })
+        entry_indexes.append(index)
+
+    # On failure add_product_images removes the files written above before the locks are released
+    created = await async_product_service.add_product_images(db, product_id=product_id, images=entries) if entries else []
+    created_by_index = dict(zip(entry_indexes, created))
+
+    results = []
+    for index, image in enumerate(images):
+        db_image = created_by_index.get(index)
+        if db_image is not None:
+            results.append(schemas.ProductImageUploadResult(
+                index=index, filename=image.filename, status="created", image=schemas.ProductImage.model_validate(db_image)
+            ))
+        else:
+            results.append(schemas.ProductImageUploadResult(
+                index=index, filename=image.filename, status="failed",
+                detail=failures.get(index, "The stored copy of this image was just deleted, upload it again")
+            ))
+    return schemas.ProductImageBatchUpload(
+        created=sum(result.status == "created" for result in results),
+        failed=sum(result.status == "failed" for result in results),
+        results=results,
+    )
 
 @router.get("/{product_id}/stock-history", response_model=List[schemas.StockHistory])
 async def get_stock_history(
     product_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: DBSession = Depends(get_session),
+    current_user: schemas.Principal = Depends(get_current_active_principal)
 ):
     """
     Get stock history for a product.
     """
-    product = product_service.get(db, id=product_id)
+    product = await async_product_service.get(db, id=product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
-    return product.stock_histories
+    return await async_product_service.get_stock_histories(db, product_id=product_id)
 
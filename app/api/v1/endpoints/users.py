@@ -1,10 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from typing import List, Optional
 
 from app import schemas # Use __init__ for schema imports
 from app.services import user_service
-from app.db.session import get_db
+from app.services.user_service import async_user_service
+from app.db.session import DBSession, get_session
 from app.api import dependencies
 from app.models.user import User as UserModel # UserModel to avoid conflict with schema.User
 
@@ -20,20 +20,32 @@ router = APIRouter()
     # dependencies=[Depends(dependencies.get_current_active_superuser)] # Or for superuser only
 )
 async def read_users(
-    db: Session = Depends(get_db),
+    response: Response,
+    db: DBSession = Depends(get_session),
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=200), # Max 200 users per page
+    cursor: Optional[str] = Query(None, description="Keyset pagination: X-Next-Cursor of the previous page (empty for the first page)"),
     current_user: UserModel = Depends(dependencies.get_current_active_user) # For authorization if needed
 ):
     """
     Retrieve users.
     Requires authentication. Only admins should typically access this.
     (Further authorization based on current_user.role can be added).
+    Pass `cursor` to page by keyset (newest first) instead of skip; the cursor of the
+    next page is returned in the X-Next-Cursor header (absent on the last page).
     """
     # Example authorization:
     # if not user_service.is_superuser(current_user):
     #     raise HTTPException(status_code=403, detail="Not enough permissions")
-    users = user_service.get_multi(db, skip=skip, limit=limit)
+    if cursor is not None:
+        try:
+            users, next_cursor = await async_user_service.get_multi_keyset(db, limit=limit, cursor=cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid cursor: {e}")
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return users
+    users = await async_user_service.get_multi(db, skip=skip, limit=limit)
     return users
 
 @router.get(
@@ -43,7 +55,7 @@ async def read_users(
 )
 async def read_user_by_id(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: DBSession = Depends(get_session),
     current_user: UserModel = Depends(dependencies.get_current_active_user) # For authorization
 ):
     """
@@ -54,7 +66,7 @@ async def read_user_by_id(
     # if user_id != current_user.id and not user_service.is_superuser(current_user):
     #     raise HTTPException(status_code=403, detail="Not enough permissions to view this user")
 
-    user = user_service.get(db, id=user_id)
+    user = await async_user_service.get(db, id=user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
@@ -68,14 +80,14 @@ async def read_user_by_id(
 async def update_user_by_id(
     user_id: int,
     user_in: schemas.UserUpdate,
-    db: Session = Depends(get_db),
+    db: DBSession = Depends(get_session),
     current_user: UserModel = Depends(dependencies.get_current_active_user) # For authorization
 ):
     """
     Update a user.
     Requires authentication. User can update their own info, or admin can update any.
     """
-    user = user_service.get(db, id=user_id)
+    user = await async_user_service.get(db, id=user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -91,11 +103,11 @@ async def update_user_by_id(
 
     # Check for email conflict if email is being changed
     if user_in.email and user_in.email != user.email:
-        existing_user = user_service.get_by_email(db, email=user_in.email)
+        existing_user = await async_user_service.get_by_email(db, email=user_in.email)
         if existing_user and existing_user.id != user_id:
             raise HTTPException(status_code=400, detail="Email already registered by another user.")
 
-    updated_user = user_service.update(db, db_obj=user, obj_in=user_in)
+    updated_user = await async_user_service.update(db, db_obj=user, obj_in=user_in)
     return updated_user
 
 
@@ -107,7 +119,7 @@ async def update_user_by_id(
 )
 async def deactivate_user_by_id(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: DBSession = Depends(get_session),
     current_user: UserModel = Depends(dependencies.get_current_active_user)
 ):
     """
@@ -117,19 +129,19 @@ async def deactivate_user_by_id(
     if user_id == current_user.id:
         raise HTTPException(status_code=400, detail="Cannot deactivate currently logged-in user via this endpoint.")
 
-    user_to_deactivate = user_service.get(db, id=user_id)
+    user_to_deactivate = await async_user_service.get(db, id=user_id)
     if not user_to_deactivate:
         raise HTTPException(status_code=404, detail="User not found")
 
     # Cambia el estado a 'inactive'
-    updated_user = user_service.update(db, db_obj=user_to_deactivate, obj_in={"status": "inactive"})
+    updated_user = await async_user_service.update(db, db_obj=user_to_deactivate, obj_in={"status": "inactive"})
     return updated_user
 
 
 @router.post("/", response_model=schemas.User, status_code=status.HTTP_201_CREATED)
-def create_user(
+async def create_user(
     user_in: schemas.UserCreate,
-    db: Session = Depends(get_db),
+    db: DBSession = Depends(get_session),
     current_user: UserModel = Depends(dependencies.get_current_active_user),  # Requiere autenticación
 ):
     """
@@ -137,7 +149,7 @@ def create_user(
     Requires authentication.
     """
     try:
-        user = user_service.create(db, obj_in=user_in)
+        user = await async_user_service.create(db, obj_in=user_in)
         return user
     except HTTPException as e:
         raise e
@@ -3,6 +3,8 @@ from fastapi.requests import Request
 from fastapi.responses import JSONResponse
 from pydantic import ValidationError
 from typing import Any, Optional
+
+from app.utils.executor import ExecutorSaturatedError
 # Custom Exception Classes (Optional, but can be useful for specific error types)
 
 class BaseCustomException(HTTPException):
@@ -36,6 +38,10 @@ class UnprocessableEntityException(BaseCustomException):
         self.errors = errors or []
         super().__init__(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=detail)
 
+class ServiceUnavailableException(BaseCustomException):
+    def __init__(self, detail: str = "Service temporarily unavailable, please retry", retry_after: int = 1):
+        super().__init__(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=detail, headers={"Retry-After": str(retry_after)})
+
 
 # Exception Handlers
 
@@ -72,6 +78,13 @@ async def pydantic_validation_exception_handler(request: Request, exc: Validatio
         content={"detail": clean_errors(exc.errors())}
     )
 
+async def executor_saturated_exception_handler(request: Request, exc: ExecutorSaturatedError):
+    """
+    Handler for a full BoundedExecutor (e.g. too many concurrent password hashes).
+    Sheds the request with a 503 instead of queueing it without limit.
+    """
+    return await http_exception_handler(request, ServiceUnavailableException())
+
 async def general_exception_handler(request: Request, exc: Exception):
     """
     Handler for any other unhandled exceptions.
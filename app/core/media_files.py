@@ -0,0 +1,204 @@
+import os
+import re
+import stat
+from email.utils import parsedate
+from mimetypes import guess_type
+from typing import List, Optional, Tuple
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Receive, Scope, Send
+
+# A sha256 hex digest in the file name marks content-addressed media (see app.utils.storage keys)
+CONTENT_HASH_RE = re.compile(r"[0-9a-f]{64}")
+
+# Pre-encoded siblings: "x-320w.jpg" is served from "x-320w.webp" to clients that accept WebP
+IMAGE_VARIANTS = {".jpg": ("image/webp", ".webp"), ".jpeg": ("image/webp", ".webp"), ".png": ("image/webp", ".webp")}
+# Precompressed siblings ("x.svg.br", "x.svg.gz") of compressible types, in order of preference
+PRECOMPRESSED = [("br", ".br"), ("gzip", ".gz")]
+COMPRESSIBLE_TYPES = ("text/", "image/svg+xml", "application/json", "application/javascript")
+
+
+class RangeNotSatisfiable(ValueError):
+    pass
+
+
+def accepts(header: Optional[str], token: str) -> bool:
+    """Whether an Accept / Accept-Encoding header lists `token` explicitly with a non-zero q."""
+    for item in (header or "").split(","):
+        value, *params = [part.strip() for part in item.split(";")]
+        if value.lower() != token:
+            continue
+        for param in params:
+            name, _, q = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    return float(q) > 0
+                except ValueError:
+                    return False
+        return True
+    return False
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    The first and last byte (inclusive) of a single-range `Range: bytes=...` header.
+    Returns None if the header is to be ignored (malformed, other unit or several ranges:
+    the whole file is sent) and raises RangeNotSatisfiable if it selects no byte of the file.
+    """
+    unit, _, spec = header.partition("=")
+    first, sep, last = spec.strip().partition("-")
+    if unit.strip().lower() != "bytes" or "," in spec or not sep:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        if not last.isdigit():
+            return None
+        if int(last) == 0 or size == 0:
+            raise RangeNotSatisfiable(header)
+        return max(0, size - int(last)), size - 1
+    if not first.isdigit() or (last and not last.isdigit()):
+        return None
+    start, end = int(first), int(last) if last else size - 1
+    if last and end < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable(header)
+    return start, min(end, size - 1)
+
+
+class MediaFileResponse(FileResponse):
+    """
+    FileResponse that serves single byte ranges (206, or 416 when out of bounds; honouring
+    If-Range) and lets the server send the file without copying it through Python when it
+    offers the ASGI zerocopysend extension (pathsend for whole files, else chunked reads).
+    Expects `stat_result`.
+    """
+    def if_range_matches(self, request_headers: Headers) -> bool:
+        if_range = request_headers.get("if-range")
+        if if_range is None:
+            return True
+        if if_range.startswith(('"', "W/")):
+            return if_range == self.headers.get("etag") # Strong comparison: a weak tag never matches
+        return parsedate(if_range) is not None and parsedate(if_range) == parsedate(self.headers.get("last-modified", ""))
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        request_headers = Headers(scope=scope)
+        size = self.stat_result.st_size
+        offset, count = 0, size
+        self.headers["accept-ranges"] = "bytes"
+        range_header = request_headers.get("range")
+        if range_header and self.status_code == 200 and self.if_range_matches(request_headers):
+            try:
+                byte_range = parse_range(range_header, size)
+            except RangeNotSatisfiable:
+                response = Response(status_code=416, headers={"content-range": f"bytes */{size}", "accept-ranges": "bytes"})
+                await response(scope, receive, send)
+                return
+            if byte_range is not None:
+                offset, count = byte_range[0], byte_range[1] - byte_range[0] + 1
+                self.status_code = 206
+                self.headers["content-range"] = f"bytes {byte_range[0]}-{byte_range[1]}/{size}"
+                self.headers["content-length"] = str(count)
+
+        extensions = scope.get("extensions") or {}
+        head = scope["method"].upper() == "HEAD"
+        if count == size and (head or "http.response.zerocopysend" not in extensions):
+            await super().__call__(scope, receive, send) # Whole file: pathsend or chunked reads
+            return
+
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if head:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        elif "http.response.zerocopysend" in extensions:
+            with open(self.path, "rb") as file:
+                await send({"type": "http.response.zerocopysend", "file": file, "offset": offset, "count": count})
+        else:
+            async with await anyio.open_file(self.path, mode="rb") as file:
+                await file.seek(offset)
+                remaining = count
+                while remaining > 0:
+                    chunk = await file.read(min(self.chunk_size, remaining))
+                    remaining -= len(chunk)
+                    more_body = remaining > 0 and len(chunk) > 0
+                    await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+                    if not more_body:
+                        break
+        if self.background is not None:
+            await self.background()
+
+
+class MediaFiles(StaticFiles):
+    """
+    StaticFiles for the media storage. Content-addressed files (a sha256 in the name) never
+    change, so they get a long `immutable` Cache-Control and an ETag derived from the name
+    (the same on every server). A WebP sibling of a JPEG/PNG is served to clients whose Accept
+    lists image/webp, and a .br/.gz sibling of compressible files per Accept-Encoding, with Vary
+    set accordingly. Conditional requests follow RFC 9110 (If-None-Match takes precedence over
+    If-Modified-Since); Range requests are handled by MediaFileResponse.
+    """
+    def __init__(self, *, immutable_max_age: int = 31536000, **kwargs):
+        super().__init__(**kwargs)
+        self.immutable_max_age = immutable_max_age
+
+    def select_variant(
+        self, full_path: str, stat_result: os.stat_result, request_headers: Headers
+    ) -> Tuple[str, os.stat_result, str, Optional[str], List[str]]:
+        """(path, stat, media type, content encoding, vary) of the representation to send."""
+        path, media_type, encoding, vary = full_path, guess_type(full_path)[0] or "text/plain", None, []
+        root, extension = os.path.splitext(full_path)
+        variant = IMAGE_VARIANTS.get(extension.lower())
+        if variant is not None:
+            variant_type, variant_extension = variant
+            variant_stat = _stat_file(root + variant_extension)
+            if variant_stat is not None:
+                vary.append("Accept")
+                if accepts(request_headers.get("accept"), variant_type):
+                    path, stat_result, media_type = root + variant_extension, variant_stat, variant_type
+        elif media_type.startswith(COMPRESSIBLE_TYPES):
+            vary.append("Accept-Encoding")
+            for name, suffix in PRECOMPRESSED:
+                compressed_stat = _stat_file(path + suffix) if accepts(request_headers.get("accept-encoding"), name) else None
+                if compressed_stat is not None:
+                    path, stat_result, encoding = path + suffix, compressed_stat, name
+                    break
+        return path, stat_result, media_type, encoding, vary
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope: Scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        path, stat_result, media_type, encoding, vary = self.select_variant(str(full_path), stat_result, request_headers)
+        headers = {}
+        if vary:
+            headers["vary"] = ", ".join(vary)
+        if encoding:
+            headers["content-encoding"] = encoding
+        if CONTENT_HASH_RE.search(os.path.basename(path)):
+            headers["cache-control"] = f"public, max-age={self.immutable_max_age}, immutable"
+            headers["etag"] = f'"{os.path.basename(path)}"'
+        response = MediaFileResponse(
+            path, status_code=status_code, headers=headers, media_type=media_type, stat_result=stat_result
+        )
+        if status_code == 200 and self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+    def is_not_modified(self, response_headers: Headers, request_headers: Headers) -> bool:
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match is not None:
+            # Weak comparison; If-Modified-Since is ignored when If-None-Match is present
+            etag = response_headers.get("etag", "").replace("W/", "", 1)
+            tags = [tag.strip().replace("W/", "", 1) for tag in if_none_match.split(",")]
+            return "*" in tags or etag in tags
+        if_modified_since = parsedate(request_headers.get("if-modified-since", ""))
+        last_modified = parsedate(response_headers.get("last-modified", ""))
+        return if_modified_since is not None and last_modified is not None and if_modified_since >= last_modified
+
+
+def _stat_file(path: str) -> Optional[os.stat_result]:
+    try:
+        stat_result = os.stat(path)
+    except OSError:
+        return None
+    return stat_result if stat.S_ISREG(stat_result.st_mode) else None
@@ -0,0 +1,30 @@
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Refuses multipart requests whose Content-Length exceeds `max_bytes` with 413,
+    before any of the body is read or spooled. Per-file limits are enforced while the body is
+    parsed (app.core.uploads.UploadRoute).
+    """
+    def __init__(self, app: ASGIApp, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            headers = Headers(scope=scope)
+            content_length = headers.get("content-length", "")
+            if (
+                headers.get("content-type", "").startswith("multipart/form-data")
+                and content_length.isdigit()
+                and int(content_length) > self.max_bytes
+            ):
+                response = JSONResponse(
+                    status_code=413, content={"detail": f"Request body exceeds {self.max_bytes} bytes"}
+                )
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
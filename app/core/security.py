@@ -1,5 +1,7 @@
+import hashlib
+import time
 from datetime import datetime, timedelta, timezone
-from typing import Optional, Union, Any
+from typing import Dict, Optional, Tuple, Union, Any
 
 from jose import jwt, JWTError
 from passlib.context import CryptContext
@@ -7,8 +9,42 @@ from pydantic import ValidationError
 
 from app.core.config import settings
 from app.schemas.token import TokenData # Assuming TokenData schema is defined
+from app.utils.cache import TTLCache
+from app.utils.executor import BoundedExecutor
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+def build_pwd_context() -> CryptContext:
+    """
+    CryptContext for the configured schemes and costs.
+    Every scheme but the first is deprecated, and min/max rounds are pinned to the configured
+    value, so `needs_update` flags any hash made with another scheme or cost.
+    """
+    schemes = settings.password_hash_schemes
+    options = {}
+    if "bcrypt" in schemes:
+        rounds = settings.PASSWORD_BCRYPT_ROUNDS
+        options.update(bcrypt__rounds=rounds, bcrypt__min_rounds=rounds, bcrypt__max_rounds=rounds)
+    if "pbkdf2_sha256" in schemes:
+        rounds = settings.PASSWORD_PBKDF2_ROUNDS
+        options.update(pbkdf2_sha256__rounds=rounds, pbkdf2_sha256__min_rounds=rounds, pbkdf2_sha256__max_rounds=rounds)
+    if "argon2" in schemes:
+        options.update(argon2__time_cost=settings.PASSWORD_ARGON2_TIME_COST, argon2__memory_cost=settings.PASSWORD_ARGON2_MEMORY_COST)
+    return CryptContext(schemes=schemes, deprecated="auto", **options)
+
+pwd_context = build_pwd_context()
+
+# Dedicated pool for bcrypt, so logins can't starve the threadpool used for DB work.
+# When it is saturated the async helpers raise ExecutorSaturatedError (answered with 503).
+password_executor = BoundedExecutor(
+    "password_hashing",
+    kind=settings.PASSWORD_HASH_EXECUTOR,
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+)
+
+# Successfully decoded tokens (sha256 of the token -> TokenData), so the signature isn't re-verified per request
+token_cache = TTLCache(
+    "auth_token", maxsize=settings.AUTH_TOKEN_CACHE_MAX_ENTRIES, ttl=settings.AUTH_TOKEN_CACHE_TTL_SECONDS
+)
 
 ALGORITHM = settings.ALGORITHM
 SECRET_KEY = settings.SECRET_KEY
@@ -16,23 +52,27 @@ ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
 REFRESH_TOKEN_EXPIRE_DAYS = settings.REFRESH_TOKEN_EXPIRE_DAYS
 
 
-def create_access_token(subject: Union[str, Any], expires_delta: Optional[timedelta] = None) -> str:
+def create_access_token(
+    subject: Union[str, Any], expires_delta: Optional[timedelta] = None, claims: Optional[Dict[str, Any]] = None
+) -> str:
     if expires_delta:
         expire = datetime.now(timezone.utc) + expires_delta
     else:
         expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
 
-    to_encode = {"exp": expire, "sub": str(subject)}
+    to_encode = {**(claims or {}), "exp": expire, "sub": str(subject)}
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def create_refresh_token(subject: Union[str, Any], expires_delta: Optional[timedelta] = None) -> str:
+def create_refresh_token(
+    subject: Union[str, Any], expires_delta: Optional[timedelta] = None, claims: Optional[Dict[str, Any]] = None
+) -> str:
     if expires_delta:
         expire = datetime.now(timezone.utc) + expires_delta
     else:
         expire = datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
 
-    to_encode = {"exp": expire, "sub": str(subject), "type": "refresh"} # Add a type claim for refresh tokens
+    to_encode = {**(claims or {}), "exp": expire, "sub": str(subject), "type": "refresh"} # Add a type claim for refresh tokens
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
@@ -42,20 +82,49 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password and, if the stored hash is outdated (scheme or cost), return a new hash
+    to persist: (verified, new_hash or None).
+    """
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await password_executor.run(verify_password, plain_password, hashed_password)
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return await password_executor.run(verify_and_update_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    return await password_executor.run(get_password_hash, password)
+
 def decode_token(token: str) -> Optional[TokenData]:
     """
     Decodes a JWT token and returns the payload as TokenData.
     Returns None if decoding fails or token is invalid/expired.
+    Valid tokens are cached until their exp, so repeated requests skip the signature check.
+    The returned TokenData may be shared between requests; don't modify it.
     """
+    key = hashlib.sha256(token.encode("utf-8")).digest()
+    token_data = token_cache.get(key)
+    if token_data is not None:
+        return token_data
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         # Validate payload against TokenData schema (optional but good practice)
         # This ensures 'sub' field exists, etc.
         token_data = TokenData(**payload)
-        return token_data
     except (JWTError, ValidationError):
         # Could log the error here
         return None
+    exp = payload.get("exp")
+    if isinstance(exp, (int, float)):
+        remaining = exp - time.time()
+        if remaining > 0:
+            token_cache.set(key, token_data, ttl=remaining)
+    else:
+        token_cache.set(key, token_data)
+    return token_data
 
 # Example usage (for testing or other modules):
 if __name__ == "__main__":
@@ -0,0 +1,74 @@
+import tempfile
+from typing import Callable, Coroutine, Any, Optional
+
+from fastapi import HTTPException, Request, Response
+from fastapi.routing import APIRoute
+from starlette.datastructures import FormData
+from starlette.formparsers import MultiPartException, MultiPartParser
+
+from app.core.config import settings
+
+
+class UploadMultiPartParser(MultiPartParser):
+    """
+    MultiPartParser that writes file parts to named temp files, so `UploadFile.file.name` is a
+    path the image pool can open without another copy, and that refuses the request with 413 as
+    soon as more than `max_file_bytes` of one file part have been received.
+    Built on parser internals (_current_part, _files_to_close_on_error, Request._get_form) of the
+    Starlette version pinned in requirements.txt; tests/utils/test_uploads.py checks they are there.
+    """
+    def __init__(self, *args, max_file_bytes: Optional[int] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_file_bytes = max_file_bytes
+        self._current_file_bytes = 0
+
+    def on_headers_finished(self) -> None:
+        super().on_headers_finished()
+        upload = self._current_part.file
+        if upload is not None:
+            self._files_to_close_on_error.pop().close() # The SpooledTemporaryFile made by the base class
+            upload.file = tempfile.NamedTemporaryFile(prefix="upload-") # Deleted when the form is closed
+            self._files_to_close_on_error.append(upload.file)
+            self._current_file_bytes = 0
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._current_part.file is not None and self.max_file_bytes is not None:
+            self._current_file_bytes += end - start
+            if self._current_file_bytes > self.max_file_bytes:
+                raise HTTPException(status_code=413, detail=f"File exceeds {self.max_file_bytes} bytes")
+        super().on_part_data(data, start, end)
+
+    async def parse(self) -> FormData:
+        try:
+            return await super().parse()
+        except HTTPException:
+            for file in self._files_to_close_on_error:
+                file.close()
+            raise
+
+
+class UploadRequest(Request):
+    """Request whose multipart form is parsed by UploadMultiPartParser (IMAGE_MAX_UPLOAD_BYTES per file)."""
+    async def _get_form(self, *, max_files: int | float = 1000, max_fields: int | float = 1000) -> FormData:
+        content_type = self.headers.get("Content-Type", "").split(";")[0].strip().lower()
+        if self._form is None and content_type == "multipart/form-data":
+            parser = UploadMultiPartParser(
+                self.headers, self.stream(), max_files=max_files, max_fields=max_fields,
+                max_file_bytes=settings.IMAGE_MAX_UPLOAD_BYTES,
+            )
+            try:
+                self._form = await parser.parse()
+            except MultiPartException as exc:
+                raise HTTPException(status_code=400, detail=exc.message)
+        return await super()._get_form(max_files=max_files, max_fields=max_fields)
+
+
+class UploadRoute(APIRoute):
+    """Route class (APIRouter(route_class=UploadRoute)) for routers that take file uploads."""
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+
+        async def upload_route_handler(request: Request) -> Response:
+            return await handler(UploadRequest(request.scope, request.receive))
+
+        return upload_route_handler
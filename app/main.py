@@ -12,18 +12,23 @@ from pydantic import ValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from sqlalchemy.exc import IntegrityError
 from contextlib import asynccontextmanager
-from fastapi.staticfiles import StaticFiles
 
 from app.api.v1 import api_router
 from app.core.config import settings
-from app.db.session import engine, check_db_connection
+from starlette.concurrency import run_in_threadpool
+from app.db.session import engine, async_engine, check_db_connection, SessionLocal
 from app.db.base_class import Base
 from app.models import * # noqa Ensure all models are imported for Base.metadata
 from app.core.exceptions import (
     http_exception_handler,
     pydantic_validation_exception_handler,
+    executor_saturated_exception_handler,
     general_exception_handler,
 )
+from app.core.media_files import MediaFiles
+from app.core.middleware import UploadSizeLimitMiddleware
+from app.services.product_service import product_service
+from app.utils.executor import ExecutorSaturatedError, shutdown_executors
 
 
 def create_tables(): # For dev/testing
@@ -44,8 +49,14 @@ async def lifespan(app: FastAPI):
         # create_tables() # If you want to ensure tables are created on startup
     else:
         print("CRITICAL: Database connection FAILED. Application functionality will be impaired.")
+    # Product search index (SEARCH_BACKEND=memory): built before serving, then kept fresh in the background
+    await run_in_threadpool(product_service.sync_search_index, SessionLocal)
+    product_service.start_search_refresher(SessionLocal)
     yield
-    # (Optional) Add shutdown logic here
+    product_service.stop_search_refresher()
+    shutdown_executors()
+    if async_engine is not None:
+        await async_engine.dispose()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -67,9 +78,13 @@ async def sqlalchemy_integrity_error_handler(request, exc: IntegrityError):
         content={"detail": error_detail, "error_type": "IntegrityError", "db_error": str(exc.orig)},
     )
 app.add_exception_handler(IntegrityError, sqlalchemy_integrity_error_handler)
+app.add_exception_handler(ExecutorSaturatedError, executor_saturated_exception_handler)
 app.add_exception_handler(Exception, general_exception_handler) # Catch-all
 
 
+# Refuse oversized uploads before reading them (added before CORS so its 413s still get CORS headers)
+app.add_middleware(UploadSizeLimitMiddleware, max_bytes=settings.MAX_UPLOAD_REQUEST_BYTES)
+
 # CORS Middleware
 if settings.BACKEND_CORS_ORIGINS:
     print(f"Configuring CORS for origins: {settings.BACKEND_CORS_ORIGINS}") # For debugging
@@ -79,13 +94,16 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_credentials=True,
         allow_methods=["*"], # Allows all standard methods
         allow_headers=["*"], # Allows all headers
+        expose_headers=["X-Next-Cursor"], # Keyset pagination cursor for list endpoints
     )
 else:
     print("Warning: No CORS origins configured. CORS will not be enabled.")
 
 # Asegúrate de que la carpeta 'media' exista en la raíz del proyecto
-os.makedirs("media", exist_ok=True)
-app.mount("/media", StaticFiles(directory="media"), name="media")
+os.makedirs(settings.MEDIA_ROOT, exist_ok=True)
+app.mount(
+    "/media", MediaFiles(directory=settings.MEDIA_ROOT, immutable_max_age=settings.MEDIA_IMMUTABLE_MAX_AGE), name="media"
+)
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
@@ -3,6 +3,7 @@ from .user import User
 from .category import Category
 from .product import Product, ProductVariant
 from .product_image import ProductImage
+from .media_blob import MediaBlob
 from .stock_history import StockHistory
 
 # This makes it easier to import all models via `from app.models import *`
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, String, DateTime, JSON
+from app.db.base_class import Base
+import datetime
+
+class MediaBlob(Base):
+    __tablename__ = "media_blobs" # Explicitly define table name
+
+    id = Column(Integer, primary_key=True, index=True)
+    # sha256 of the uploaded file, before any processing; identical uploads share one blob
+    content_hash = Column(String(64), unique=True, index=True, nullable=False)
+    storage_key = Column(String(255), nullable=False)
+    derivatives = Column(JSON, nullable=True) # {format: {width: storage_key}}, like ProductImage.derivatives
+    placeholder = Column(String(1024), nullable=True) # Copied to the images using this blob
+    # Number of ProductImage rows using this blob; its files are deleted when it drops to 0. A row at 0
+    # is a lock being held by an upload storing the files, or a blob waiting for purge_blob
+    ref_count = Column(Integer, nullable=False, default=1)
+    created_at = Column(DateTime, default=datetime.datetime.now)
+
+    def __repr__(self):
+        return f"<MediaBlob(id={self.id}, content_hash='{self.content_hash}', ref_count={self.ref_count})>"
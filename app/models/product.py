@@ -1,6 +1,6 @@
 from sqlalchemy import (
-    Column, Integer, String, Text, Boolean, Float, DateTime, ForeignKey,
-    JSON, Enum as SQLAlchemyEnum
+    Column, Integer, String, Text, Boolean, Float, Double, DateTime, ForeignKey,
+    JSON, Index, Computed, Enum as SQLAlchemyEnum
 )
 from sqlalchemy.orm import relationship
 from app.db.base_class import Base
@@ -8,6 +8,16 @@ import datetime
 
 class Product(Base):
     __tablename__ = "products" # Explicitly define table name
+    __table_args__ = (
+        # MATCH ... AGAINST for SEARCH_BACKEND=fulltext; MySQL only, other databases skip it
+        Index("ft_products_search", "name", "short_description", "description", mysql_prefix="FULLTEXT").ddl_if(dialect="mysql"),
+        # Category listings (GET /products?category_id=&status=&sort=): the filters, then the sort key.
+        # InnoDB and SQL Server append the primary key, the keyset tie-breaker, to each of them.
+        Index("ix_products_category_status_price", "category_id", "status", "effective_price"),
+        Index("ix_products_category_status_name", "category_id", "status", "name"),
+        Index("ix_products_category_status_created", "category_id", "status", "created_at"),
+        Index("ix_products_category_status_updated", "category_id", "status", "updated_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(255), nullable=False, index=True)
@@ -24,6 +34,9 @@ class Product(Base):
     base_price = Column(Float, nullable=False)
     sale_price = Column(Float, nullable=True)
     cost_price = Column(Float, nullable=True)
+    # What a customer pays, maintained by the database for price filters and sorting. DOUBLE so the
+    # value read back compares equal in keyset cursors (MySQL FLOAT is single precision).
+    effective_price = Column(Double, Computed("COALESCE(sale_price, base_price)", persisted=True))
 
     stock = Column(Integer, default=0)
     reserved_stock = Column(Integer, default=0)
@@ -41,8 +54,9 @@ class Product(Base):
     visibility = Column(SQLAlchemyEnum("public", "private", "catalog", name="product_visibility_enum"), default="private", nullable=False)
     featured = Column(Boolean, default=False)
 
-    created_at = Column(DateTime, default=datetime.datetime.now) # Changed to .now
-    updated_at = Column(DateTime, default=datetime.datetime.now, onupdate=datetime.datetime.now) # Changed to .now
+    # NOT NULL: keyset pagination on these sorts compares them, and NULL compares as neither side
+    created_at = Column(DateTime, default=datetime.datetime.now, nullable=False) # Changed to .now
+    updated_at = Column(DateTime, default=datetime.datetime.now, onupdate=datetime.datetime.now, nullable=False) # Changed to .now
 
     created_by_user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     last_modified_by_user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, JSON
 from sqlalchemy.orm import relationship
 from app.db.base_class import Base
 
@@ -7,12 +7,21 @@ class ProductImage(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     url = Column(String(2048), nullable=False)
+    # Key of the file in the media storage (app.utils.storage); NULL for external URLs
+    storage_key = Column(String(255), nullable=True)
+    # Resized copies: {"webp": {"320": storage_key, ...}, "jpeg": {...}} (see app.utils.images.render_derivatives)
+    derivatives = Column(JSON, nullable=True)
+    # Tiny blurred preview as a data URL (see app.utils.images.render_placeholder); NULL until computed
+    placeholder = Column(String(1024), nullable=True)
+    # Shared, reference-counted upload this image uses (NULL for external/migrated images)
+    blob_id = Column(Integer, ForeignKey("media_blobs.id"), nullable=True, index=True)
     alt = Column(String(255), nullable=True)
     display_order = Column(Integer, default=0) # Removed name="order" as it's not problematic here, but good practice to avoid SQL keywords
     is_main = Column(Boolean, default=False)
 
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
     product = relationship("Product", back_populates="images")
+    blob = relationship("MediaBlob")
 
     def __repr__(self):
         return f"<ProductImage(id={self.id}, url='{self.url}', product_id={self.product_id})>"
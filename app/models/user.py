@@ -14,6 +14,8 @@ class User(Base):
     status = Column(SQLAlchemyEnum("active", "inactive", name="user_status_enum"), default="active")
     created_at = Column(DateTime, default=datetime.datetime.now) # Changed to .now for non-UTC if preferred
     avatar = Column(String(255), nullable=True)
+    # Embedded in access tokens (JWT_PRINCIPAL_CLAIMS); bumped on password/role/status/email changes to revoke them
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
 
     # Relationships
     # Products created by this user (example, if Product model has 'created_by_user_id')
@@ -2,7 +2,7 @@
 from typing import Literal # Imported here if used directly in schemas like user.py
 
 # Token Schemas
-from .token import Token, TokenData, RefreshToken
+from .token import Token, TokenData, RefreshToken, Principal
 
 # User Schemas
 from .user import User, UserCreate, UserUpdate, UserLogin, UserInDB, UserStatus
@@ -11,7 +11,7 @@ from .user import User, UserCreate, UserUpdate, UserLogin, UserInDB, UserStatus
 from .category import Category, CategoryCreate, CategoryUpdate, CategorySimple
 
 # Product Image Schemas
-from .product_image import ProductImage, ProductImageCreate  # Elimina ProductImageUpdate si no existe
+from .product_image import ProductImage, ProductImageCreate, ProductImageUploadMeta, ProductImageUploadResult, ProductImageBatchUpload  # Elimina ProductImageUpdate si no existe
 
 # Product Variant Schemas
 from .product_variant import ProductVariant, ProductVariantCreate, ProductVariantUpdate, VariantType
@@ -25,10 +25,14 @@ from .product import (
     ProductCreate,
     ProductUpdate,
     ProductPaginated,
+    FacetCount,
+    ProductSummary,
+    ProductSummaryPaginated,
     DiscountSchema,
     CustomerPricingSchema,
     ProductStatus, # This is a Literal type
-    ProductVisibility # This is a Literal type
+    ProductVisibility, # This is a Literal type
+    ProductSort # This is a Literal type
 )
 
 # This makes it easier to import schemas from app.schemas.MySchema
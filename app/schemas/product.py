@@ -1,5 +1,5 @@
 from pydantic import BaseModel, HttpUrl, conint, confloat
-from typing import Optional, List, Any, Dict, Literal
+from typing import Optional, List, Any, Dict, Literal, Union
 from datetime import datetime
 from .category import CategorySimple as ProductCategorySchema # Use simple category for product
 from .product_image import ProductImageCreate, ProductImageUpdate, ProductImage as ProductImageSchema
@@ -10,6 +10,8 @@ from .product_variant import ProductVariantCreate, ProductVariantUpdate, Product
 # Enums matching the model definitions
 ProductStatus = Literal["active", "inactive", "draft"]
 ProductVisibility = Literal["public", "private", "catalog"]
+# Product list orderings (GET /products?sort=), "-" for descending
+ProductSort = Literal["-id", "price", "-price", "name", "-created_at", "-updated_at"]
 
 # Schemas for JSON fields (Discounts, CustomerPricing)
 # These are based on the Angular interfaces.
@@ -126,12 +128,45 @@ class Product(ProductBase):
         from_attributes = True
 
 
+# Slim product for list views (?view=summary): no images/variants, so nothing beyond the page query is loaded
+class ProductSummary(BaseModel):
+    id: int
+    name: str
+    slug: str
+    sku: str
+    short_description: Optional[str] = None
+    category_id: int
+    category: ProductCategorySchema
+    base_price: float
+    sale_price: Optional[float] = None
+    stock: int = 0
+    status: ProductStatus
+    visibility: ProductVisibility
+    featured: bool = False
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+# Facet counts of a product list (GET /products?facets=...)
+class FacetCount(BaseModel):
+    value: Union[bool, int, str, None]
+    count: int
+    min: Optional[float] = None # Price buckets: min <= price < max (max None for the last one)
+    max: Optional[float] = None
+
 # For paginated product lists
 class ProductPaginated(BaseModel):
     total: int
     items: List[Product]
-    page: int
+    page: Optional[int] = None # None in cursor mode
     size: int
+    next_cursor: Optional[str] = None # Pass as ?cursor= to fetch the next page; None on the last page
+    facets: Optional[Dict[str, List[FacetCount]]] = None # Only when requested with ?facets=
+
+class ProductSummaryPaginated(ProductPaginated):
+    items: List[ProductSummary]
     # pages: int # Optional: total pages
 
 Product.model_rebuild() # If there are forward refs that need resolving, like with Category
@@ -1,5 +1,7 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field, computed_field
+from typing import Dict, List, Literal, Optional
+
+from app.utils.storage import get_storage
 
 class ProductImageBase(BaseModel):
     url: str  # <-- Debe ser str, NO HttpUrl ni AnyUrl
@@ -17,11 +19,44 @@ class ProductImage(BaseModel):
     display_order: Optional[int] = 0
     is_main: bool
     product_id: int
+    # Tiny blurred preview (data URL) to show while the image loads
+    placeholder: Optional[str] = None
+    derivatives: Optional[Dict[str, Dict[str, str]]] = Field(default=None, exclude=True)
 
     model_config = {
         "from_attributes": True
     }
 
+    @computed_field
+    @property
+    def srcset(self) -> Optional[Dict[str, str]]:
+        """Resized copies per format, as `srcset` strings: {"webp": "/media/... 96w, /media/... 320w", ...}."""
+        if not self.derivatives:
+            return None
+        storage = get_storage()
+        return {
+            fmt: ", ".join(f"{storage.url(key)} {width}w" for width, key in sorted(by_width.items(), key=lambda item: int(item[0])))
+            for fmt, by_width in self.derivatives.items() if by_width
+        }
+
+class ProductImageUploadMeta(BaseModel):
+    """Per-file fields of a batch upload (the `metadata` form field is a JSON list of these)."""
+    alt: Optional[str] = None
+    display_order: Optional[int] = None # Defaults to the file's position in the batch
+    is_main: bool = False
+
+class ProductImageUploadResult(BaseModel):
+    index: int # Position of the file in the request
+    filename: Optional[str] = None
+    status: Literal["created", "failed"]
+    detail: Optional[str] = None # Why the file failed
+    image: Optional[ProductImage] = None
+
+class ProductImageBatchUpload(BaseModel):
+    created: int
+    failed: int
+    results: List[ProductImageUploadResult]
+
 class ProductImageUpdate(ProductImageCreate):
     pass
     product_id: int # Ensure this is present if you need to expose it
@@ -9,6 +9,16 @@ class Token(BaseModel):
 class TokenData(BaseModel):
     # 'sub' (subject) is typically the user's ID or email
     sub: Optional[str] = None
+    # Token version, only present when JWT_PRINCIPAL_CLAIMS is enabled
+    ver: Optional[int] = None
+
+class Principal(BaseModel):
+    # The authenticated identity, for endpoints that don't need the whole User row
+    id: int
+    email: str
+    role: Optional[str] = None
+    status: Optional[str] = None
+    token_version: int = 0
 
 class RefreshToken(BaseModel):
     refresh_token: str
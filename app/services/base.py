@@ -1,17 +1,72 @@
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union, Tuple
+from typing import Any, Callable, Dict, Generic, List, NamedTuple, Optional, Type, TypeVar, Union, Tuple
 
+from fastapi.concurrency import run_in_threadpool
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 
 from app.db.base_class import Base
+from app.utils.pagination import encode_cursor, decode_cursor
 
 ModelType = TypeVar("ModelType", bound=Base)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
 
 
+class KeysetKey(NamedTuple):
+    """One column of a keyset ordering. `value` reads the key back from a loaded row."""
+    column: Any
+    descending: bool
+    value: Callable[[Any], Any]
+
+
+def keyset_key(column: Any, descending: bool = False) -> KeysetKey:
+    return KeysetKey(column, descending, lambda obj, key=column.key: getattr(obj, key))
+
+
+def keyset_after(keys: List[KeysetKey], values: List[Any]):
+    """
+    WHERE clause selecting the rows that come after `values` in the `keys` ordering.
+    Expanded to (a > x) OR (a = x AND b > y) ... instead of a row-value comparison,
+    which SQL Server does not support and which breaks with mixed directions.
+    """
+    clauses = []
+    for i, key in enumerate(keys):
+        equal = [prev.column == value for prev, value in zip(keys[:i], values[:i])]
+        after = key.column < values[i] if key.descending else key.column > values[i]
+        clauses.append(and_(*equal, after))
+    return or_(*clauses)
+
+
+def keyset_cursor(keys: List[KeysetKey], sort: str, obj: Any) -> str:
+    return encode_cursor(sort, [key.value(obj) for key in keys])
+
+
+def paginate_keyset(
+    query: Query, keys: List[KeysetKey], *, sort: str, limit: int, cursor: Optional[str] = None
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    Keyset (cursor) pagination: seeks past the last row of the previous page instead of
+    using OFFSET, so the cost of a page does not depend on how deep it is.
+    The last key must be unique (the primary key) so the ordering is total.
+    Returns the page and the cursor for the next one (None on the last page).
+    Raises ValueError for an invalid cursor.
+    """
+    if cursor:
+        values = decode_cursor(cursor, sort)
+        if len(values) != len(keys):
+            raise ValueError("Malformed cursor")
+        query = query.filter(keyset_after(keys, values))
+    order_by = [key.column.desc() if key.descending else key.column.asc() for key in keys]
+    rows = query.order_by(*order_by).limit(limit + 1).all()
+    items = rows[:limit]
+    next_cursor = keyset_cursor(keys, sort, items[-1]) if len(rows) > limit else None
+    return items, next_cursor
+
+
 class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     def __init__(self, model: Type[ModelType]):
         """
@@ -27,6 +82,10 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     def get(self, db: Session, id: Any) -> Optional[ModelType]:
         return db.query(self.model).filter(self.model.id == id).first()
 
+    def exists(self, db: Session, id: Any) -> bool:
+        """Whether a row with this id exists (primary key lookup only, no relationships loaded)."""
+        return db.query(self.model.id).filter(self.model.id == id).first() is not None
+
     def get_multi(
         self, db: Session, *, skip: int = 0, limit: int = 100
     ) -> List[ModelType]:
@@ -45,6 +104,23 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         items = db.query(self.model).offset(skip).limit(limit).all()
         return items, total
 
+    def get_keyset_keys(self, sort: str = "-id") -> List[KeysetKey]:
+        """Keyset ordering for `sort`. The base implementation only knows "-id" (newest first)."""
+        if sort != "-id":
+            raise ValueError(f"Unsupported sort: {sort}")
+        return [keyset_key(self.model.id, descending=True)]
+
+    def get_multi_keyset(
+        self, db: Session, *, limit: int = 100, cursor: Optional[str] = None, sort: str = "-id"
+    ) -> Tuple[List[ModelType], Optional[str]]:
+        return paginate_keyset(
+            db.query(self.model), self.get_keyset_keys(sort), sort=sort, limit=limit, cursor=cursor
+        )
+
+    def get_next_cursor(self, obj: ModelType, sort: str = "-id") -> str:
+        """Cursor pointing right after `obj`, e.g. to continue an offset page in keyset mode."""
+        return keyset_cursor(self.get_keyset_keys(sort), sort, obj)
+
     def create(self, db: Session, *, obj_in: CreateSchemaType, **kwargs) -> ModelType:
         obj_in_data = jsonable_encoder(obj_in)
         # Add any additional kwargs passed to the create method, e.g. user_id
@@ -111,7 +187,46 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             db.rollback()
             raise e
 
+
+async def run_in_session(db: Union[Session, AsyncSession], fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Run a synchronous service function without blocking the event loop.
+    With an AsyncSession the function runs through `run_sync` (IO goes through the async driver);
+    with a plain Session it is offloaded to the threadpool.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(fn, db, *args, **kwargs)
+
+
+class AsyncCRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
+    def __init__(self, crud: CRUDBase[ModelType, CreateSchemaType, UpdateSchemaType]):
+        """
+        Awaitable variant of a CRUD object, for use from `async def` endpoints.
+
+        Every method of the wrapped CRUD object is exposed as a coroutine with the same
+        signature (session first), so the query logic lives in a single place.
+
+        **Parameters**
+
+        * `crud`: A CRUDBase instance
+        """
+        self.crud = crud
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self.crud, name)
+        if not callable(attr):
+            return attr
+
+        async def method(db: Union[Session, AsyncSession], *args, **kwargs) -> Any:
+            return await run_in_session(db, attr, *args, **kwargs)
+
+        method.__name__ = name
+        return method
+
 # Example of how to use it:
 # from app.models.user import User
 # from app.schemas.user import UserCreate, UserUpdate
 # user_service = CRUDBase[User, UserCreate, UserUpdate](User)
+# async_user_service = AsyncCRUDBase(user_service)
+# user = await async_user_service.get(db, id=1)
@@ -1,11 +1,93 @@
+import time
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Union
 
-from app.services.base import CRUDBase
+from app.core.config import settings
+from app.services.base import CRUDBase, AsyncCRUDBase
+from app.services.product_service import product_service
 from app.models.category import Category
-from app.schemas.category import CategoryCreate, CategoryUpdate
+from app.schemas.category import CategoryCreate, CategoryUpdate, CategorySimple, Category as CategorySchema
+
+
+class CategoryTree:
+    """
+    The whole category hierarchy, assembled in memory from a single query.
+    Nodes are returned as `schemas.Category` with their subcategories already filled in,
+    so serializing them never goes back to the database.
+    `depth` limits how many levels of subcategories are included (None = all, 0 = none).
+    """
+    def __init__(self, categories: List[Category]):
+        self.by_id: Dict[int, CategorySimple] = {}
+        self.by_slug: Dict[str, CategorySimple] = {}
+        self.children: Dict[Optional[int], List[int]] = {}
+        self._top_level: Dict[Optional[int], List[CategorySchema]] = {} # Memoized per depth (navigation menu)
+        for category in categories:
+            node = CategorySimple.model_validate(category)
+            self.by_id[node.id] = node
+            self.by_slug[node.slug] = node
+        for node in self.by_id.values():
+            # Orphans (parent missing) are treated as top-level
+            parent_id = node.parent_id if node.parent_id in self.by_id else None
+            self.children.setdefault(parent_id, []).append(node.id)
+
+    def build(self, category_id: int, depth: Optional[int] = None, _path: frozenset = frozenset()) -> CategorySchema:
+        node = self.by_id[category_id]
+        path = _path | {category_id}
+        subcategories = []
+        if depth is None or depth > 0:
+            next_depth = None if depth is None else depth - 1
+            subcategories = [
+                self.build(child_id, next_depth, path)
+                for child_id in self.children.get(category_id, [])
+                if child_id not in path # Guard against parent_id cycles
+            ]
+        return CategorySchema(**node.model_dump(), subcategories=subcategories)
+
+    def get(self, category_id: int, depth: Optional[int] = None) -> Optional[CategorySchema]:
+        if category_id not in self.by_id:
+            return None
+        return self.build(category_id, depth)
+
+    def get_by_slug(self, slug: str, depth: Optional[int] = None) -> Optional[CategorySchema]:
+        node = self.by_slug.get(slug)
+        return self.build(node.id, depth) if node else None
+
+    def top_level(self, depth: Optional[int] = None) -> List[CategorySchema]:
+        if depth is not None and depth >= len(self.by_id):
+            depth = None # Deeper than any branch can be; keeps the memo bounded
+        if depth not in self._top_level:
+            self._top_level[depth] = [self.build(category_id, depth) for category_id in self.children.get(None, [])]
+        return self._top_level[depth]
+
+    def all(self, skip: int = 0, limit: int = 100, depth: Optional[int] = None) -> List[CategorySchema]:
+        return [self.build(category_id, depth) for category_id in list(self.by_id)[skip:skip + limit]]
+
 
 class CRUDCategory(CRUDBase[Category, CategoryCreate, CategoryUpdate]):
+    def __init__(self, model):
+        super().__init__(model)
+        # Version counter bumped by every write; the cached tree is only served for the version it was built at
+        self.tree_version = 0
+        self._tree_cache: Optional[tuple] = None # (version, built_at, CategoryTree)
+
+    def invalidate_tree(self) -> None:
+        self.tree_version += 1
+
+    def invalidate_category_data(self) -> None:
+        """After a change to existing categories: cached product details embed their category."""
+        self.invalidate_tree()
+        product_service.invalidate_all_details()
+
+    def get_cached_tree(self) -> Optional[CategoryTree]:
+        """The cached tree if it is still current, without touching the database."""
+        cached = self._tree_cache
+        if cached is None or settings.CATEGORY_TREE_CACHE_TTL_SECONDS <= 0:
+            return None
+        version, built_at, tree = cached
+        if version != self.tree_version or time.monotonic() - built_at > settings.CATEGORY_TREE_CACHE_TTL_SECONDS:
+            return None
+        return tree
+
     def get_by_slug(self, db: Session, *, slug: str) -> Optional[Category]:
         return db.query(Category).filter(Category.slug == slug).first()
 
@@ -14,13 +96,47 @@ class CRUDCategory(CRUDBase[Category, CategoryCreate, CategoryUpdate]):
         # from app.utils import generate_slug
         # if not obj_in.slug:
         #     obj_in.slug = generate_slug(obj_in.name)
-        return super().create(db, obj_in=obj_in)
+        try:
+            return super().create(db, obj_in=obj_in)
+        finally:
+            self.invalidate_tree()
+
+    def update(self, db: Session, *, db_obj: Category, obj_in: Union[CategoryUpdate, Dict[str, Any]]) -> Category:
+        try:
+            return super().update(db, db_obj=db_obj, obj_in=obj_in)
+        finally:
+            self.invalidate_category_data()
+
+    def remove(self, db: Session, *, id: int) -> Optional[Category]:
+        try:
+            return super().remove(db, id=id)
+        finally:
+            self.invalidate_category_data()
+
+    def remove_obj(self, db: Session, *, db_obj: Category) -> Category:
+        try:
+            return super().remove_obj(db, db_obj=db_obj)
+        finally:
+            self.invalidate_category_data()
 
     # You can add more category-specific methods here if needed
     # For example, getting all top-level categories:
     def get_top_level_categories(self, db: Session) -> List[Category]:
         return db.query(Category).filter(Category.parent_id == None).all()
 
+    def get_tree(self, db: Session) -> CategoryTree:
+        """
+        Load every category in one query and assemble the hierarchy in memory.
+        The result is cached until the next category write (or the TTL) in this process.
+        """
+        tree = self.get_cached_tree()
+        if tree is not None:
+            return tree
+        version = self.tree_version # Read before loading: a concurrent write makes this entry stale right away
+        tree = CategoryTree(db.query(Category).order_by(Category.id).all())
+        self._tree_cache = (version, time.monotonic(), tree)
+        return tree
+
 category_service = CRUDCategory(Category)
 get_multi_paginated = category_service.get_multi_paginated
 get_multi = category_service.get_multi
@@ -28,3 +144,8 @@ get = category_service.get
 get_by_slug = category_service.get_by_slug
 create = category_service.create
 update = category_service.update
+get_tree = category_service.get_tree
+get_cached_tree = category_service.get_cached_tree
+
+# Awaitable variant used by the async endpoints
+async_category_service = AsyncCRUDBase(category_service)
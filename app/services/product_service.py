@@ -1,15 +1,222 @@
-from sqlalchemy.orm import Session, joinedload, subqueryload
-from typing import Any, Dict, List, Optional, Union, Tuple
+import datetime
+import threading
+import time
 
-from app.services.base import CRUDBase
+from sqlalchemy import Unicode, case, cast, distinct, func, join, literal, literal_column, select, true, union_all
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session, Query, joinedload, selectinload, subqueryload
+from sqlalchemy.sql.selectable import Join, TableValuedAlias
+from typing import Any, Callable, Dict, List, Optional, Set, Union, Tuple
+
+from app.core.config import settings
+from app.services.base import CRUDBase, AsyncCRUDBase, KeysetKey, keyset_key, paginate_keyset
 from app.models.product import Product, ProductVariant
 from app.models.product_image import ProductImage
-from app.schemas.product import ProductCreate, ProductUpdate
+from app.models.media_blob import MediaBlob
+from app.models.stock_history import StockHistory
+from app.schemas.product import ProductCreate, ProductUpdate, Product as ProductSchema
 from app.schemas.product_image import ProductImageCreate, ProductImageUpdate
 from app.schemas.product_variant import ProductVariantCreate, ProductVariantUpdate
 from app.utils import generate_slug # Assuming you'll create this utility
+from app.utils.cache import TTLCache
+from app.utils.search import SearchIndex
+from app.utils.storage import get_storage
+
+# Serialized product-detail responses: ("id", id) -> (slug, json bytes), ("slug", slug) -> id
+product_detail_cache = TTLCache(
+    "product_detail", maxsize=settings.PRODUCT_CACHE_MAX_ENTRIES, ttl=settings.PRODUCT_CACHE_TTL_SECONDS
+)
+
+# Full-text index for GET /products/search: field weights (BM25), filter attributes kept per product
+product_search_index = SearchIndex(
+    "product_search",
+    weights={
+        "name": 3.0, "sku": 3.0, "barcode": 3.0, "tags": 2.0, "keywords": 2.0,
+        "short_description": 1.5, "description": 1.0,
+    },
+)
+SEARCH_ATTRIBUTES = ("category_id", "status", "featured", "effective_price")
+# Facets of GET /products?facets=... (see CRUDProduct.get_facets)
+PRODUCT_FACETS = ("category_id", "status", "visibility", "featured", "price", "tags")
+# Product list orderings (`sort`): column and direction; ties are broken by id in the same direction
+PRODUCT_SORTS = {
+    "-id": (None, True),
+    "price": ("effective_price", False),
+    "-price": ("effective_price", True),
+    "name": ("name", False),
+    "-created_at": ("created_at", True),
+    "-updated_at": ("updated_at", True),
+}
+
+@compiles(Join, "mssql")
+def _mssql_apply_join(element, compiler, **kw):
+    """SQL Server has no LATERAL: core joins to a table function (see tag_elements) are written as APPLY."""
+    if isinstance(element.right, TableValuedAlias):
+        kw["asfrom"] = True
+        apply = "OUTER APPLY" if element.isouter else "CROSS APPLY"
+        return f"{compiler.process(element.left, **kw)} {apply} {compiler.process(element.right, **kw)}"
+    return compiler.visit_join(element, **kw)
 
 class CRUDProduct(CRUDBase[Product, ProductCreate, ProductUpdate]):
+    def __init__(self, model):
+        super().__init__(model)
+        # Bumped on every invalidation; a detail loaded before a write must not be cached after it
+        self.detail_generation = 0
+        self.search_watermark: Optional[datetime.datetime] = None # Latest updated_at seen by the index
+        self.search_refresh_lock = threading.Lock()
+        self.search_refresher: Optional[Tuple[threading.Thread, threading.Event]] = None
+
+    # --- Product detail cache ---
+    def get_cached_detail(self, product_id_or_slug: str) -> Optional[bytes]:
+        """Serialized schemas.Product for an id or slug, if cached."""
+        if product_id_or_slug.isdigit():
+            entry = product_detail_cache.get(("id", int(product_id_or_slug)))
+            return entry[1] if entry else None
+        product_id = product_detail_cache.get(("slug", product_id_or_slug))
+        if product_id is None:
+            return None
+        entry = product_detail_cache.get(("id", product_id))
+        if entry is None or entry[0] != product_id_or_slug: # Slug changed since it was cached
+            return None
+        return entry[1]
+
+    def cache_detail(self, product: Product, generation: int) -> bytes:
+        """
+        Serialize a fully loaded product (see `get`) and cache it, unless it was invalidated
+        after `generation` was read (the loaded state may predate that write).
+        """
+        body = ProductSchema.model_validate(product).model_dump_json().encode("utf-8")
+        if generation == self.detail_generation:
+            product_detail_cache.set(("id", product.id), (product.slug, body))
+            product_detail_cache.set(("slug", product.slug), product.id)
+        return body
+
+    def invalidate_detail(self, product_id: int) -> None:
+        self.detail_generation += 1
+        product_detail_cache.delete(("id", product_id)) # Slug entries only point here, they go stale with it
+
+    def invalidate_all_details(self) -> None:
+        self.detail_generation += 1
+        product_detail_cache.clear()
+
+    # --- Product search index ---
+    def index_product(self, product: Any) -> None:
+        """(Re-)index a product, or any row with the indexed fields and SEARCH_ATTRIBUTES."""
+        if settings.SEARCH_BACKEND != "memory":
+            return
+        product_search_index.add(
+            product.id,
+            {field: getattr(product, field) for field in product_search_index.weights},
+            {name: getattr(product, name) for name in SEARCH_ATTRIBUTES},
+        )
+
+    def refresh_search_index(self, db: Session) -> None:
+        """
+        Bring the search index up to date: a full build if there is none yet or the last one is
+        SEARCH_INDEX_REBUILD_SECONDS old (dropping hard-deleted products); otherwise re-index the
+        products whose updated_at reached the watermark, to pick up writes made by other workers.
+        Run at startup and by the refresher thread, never by requests: a rebuild is assembled
+        aside and swapped in, so searches use the previous index meanwhile.
+        """
+        with self.search_refresh_lock:
+            started = time.monotonic()
+            columns = [self.model.id, self.model.updated_at] + [
+                getattr(self.model, name) for name in (*product_search_index.weights, *SEARCH_ATTRIBUTES)
+            ]
+            query = db.query(*columns)
+            built_at = product_search_index.built_at
+            if built_at is None or started - built_at >= settings.SEARCH_INDEX_REBUILD_SECONDS:
+                rows = query.all()
+                product_search_index.rebuild(
+                    (row.id, {field: getattr(row, field) for field in product_search_index.weights},
+                     {name: getattr(row, name) for name in SEARCH_ATTRIBUTES})
+                    for row in rows
+                )
+            elif self.search_watermark is not None:
+                rows = query.filter(self.model.updated_at >= self.search_watermark).all()
+                for row in rows:
+                    self.index_product(row)
+            else:
+                rows = []
+            updated = [row.updated_at for row in rows if row.updated_at is not None]
+            if updated and (self.search_watermark is None or max(updated) > self.search_watermark):
+                self.search_watermark = max(updated)
+
+    def sync_search_index(self, session_factory: Callable[[], Session]) -> None:
+        """refresh_search_index in a session of its own (SEARCH_BACKEND=memory only). Errors are reported, not raised."""
+        if settings.SEARCH_BACKEND != "memory":
+            return
+        db = session_factory()
+        try:
+            self.refresh_search_index(db)
+        except Exception as e:
+            print(f"Search index refresh failed: {e}")
+        finally:
+            db.close()
+
+    def start_search_refresher(self, session_factory: Callable[[], Session]) -> None:
+        """Run sync_search_index every SEARCH_INDEX_SYNC_SECONDS on a daemon thread, until stop_search_refresher."""
+        if settings.SEARCH_BACKEND != "memory" or self.search_refresher is not None:
+            return
+        stop = threading.Event()
+
+        def run() -> None:
+            while not stop.wait(settings.SEARCH_INDEX_SYNC_SECONDS):
+                self.sync_search_index(session_factory)
+
+        thread = threading.Thread(target=run, name="search-index-refresher", daemon=True)
+        self.search_refresher = (thread, stop)
+        thread.start()
+
+    def stop_search_refresher(self) -> None:
+        if self.search_refresher is None:
+            return
+        thread, stop = self.search_refresher
+        self.search_refresher = None
+        stop.set()
+        thread.join()
+
+    def search(
+        self, db: Session, *, q: str, mode: str = "natural", skip: int = 0, limit: int = 100,
+        filters: Optional[Dict[str, Any]] = None, with_details: bool = True
+    ) -> Tuple[List[Product], int]:
+        """
+        Products matching the words of `q` (accent-insensitive), most relevant first, and the
+        number of matches. `filters` are the filters of get_multi_paginated.
+        With SEARCH_BACKEND=memory: BM25 on the in-process index, filters applied in the index,
+        only the requested page loaded from the database (`mode` is ignored).
+        With SEARCH_BACKEND=fulltext: get_multi_paginated with a MATCH ... AGAINST filter in
+        `mode` ("natural" or "boolean").
+        """
+        if settings.SEARCH_BACKEND == "fulltext":
+            return self.get_multi_paginated(
+                db, skip=skip, limit=limit, filters={**(filters or {}), "search": q, "search_mode": mode},
+                with_details=with_details
+            )
+        filters = filters or {}
+        active = {name: value for name, value in filters.items() if value is not None and name in SEARCH_ATTRIBUTES}
+        price_min, price_max = filters.get("price_min"), filters.get("price_max")
+
+        def accept(attributes: Dict[str, Any]) -> bool:
+            price = attributes.get("effective_price")
+            return (
+                all(attributes.get(name) == value for name, value in active.items())
+                and (price_min is None or (price is not None and price >= price_min))
+                and (price_max is None or (price is not None and price <= price_max))
+            )
+
+        has_filters = active or price_min is not None or price_max is not None
+        ranked = product_search_index.search(q, accept=accept if has_filters else None)
+        page_ids = [product_id for product_id, _ in ranked[skip:skip + limit]]
+        if not page_ids:
+            return [], len(ranked)
+        products = db.query(self.model).filter(self.model.id.in_(page_ids)).options(
+            *self.list_options(with_details)
+        ).all()
+        by_id = {product.id: product for product in products}
+        return [by_id[product_id] for product_id in page_ids if product_id in by_id], len(ranked)
 
     def get_product_by_slug(self, db: Session, *, slug: str) -> Optional[Product]:
         return db.query(Product).filter(Product.slug == slug).options(
@@ -25,20 +232,37 @@ class CRUDProduct(CRUDBase[Product, ProductCreate, ProductUpdate]):
             subqueryload(self.model.variants)
         ).first()
 
+    def list_options(self, with_details: bool = True) -> list:
+        """
+        Loader options for list queries. Images and variants are batch-loaded with one
+        SELECT ... IN per relationship for the whole page, instead of one lazy load per product
+        while the response is serialized. Summary lists (with_details=False) skip them entirely.
+        """
+        options = [joinedload(self.model.category)]
+        if with_details:
+            options += [selectinload(self.model.images), selectinload(self.model.variants)]
+        return options
+
     def get_multi(
-        self, db: Session, *, skip: int = 0, limit: int = 100
+        self, db: Session, *, skip: int = 0, limit: int = 100, with_details: bool = True
     ) -> List[Product]:
         return db.query(self.model).order_by(self.model.id.desc()).offset(skip).limit(limit).options(
-            joinedload(self.model.category),
-            # subqueryload(self.model.images), # Maybe not load all images/variants for list view
-            # subqueryload(self.model.variants)
+            *self.list_options(with_details)
         ).all()
 
-    def get_multi_paginated(
-        self, db: Session, *, skip: int = 0, limit: int = 100, filters: Optional[Dict[str, Any]] = None
-    ) -> Tuple[List[Product], int]:
-        query = db.query(self.model)
+    def fulltext_match(self, q: str, mode: str = "natural"):
+        """
+        MySQL `MATCH (name, short_description, description) AGAINST (q ...)` (FULLTEXT index
+        ft_products_search): relevance > 0 for matching rows. In boolean mode `q` may use
+        +word -word "phrase" word* operators; "@" (InnoDB proximity syntax) is dropped.
+        """
+        if mode == "boolean":
+            return match(
+                self.model.name, self.model.short_description, self.model.description, against=q.replace("@", " ")
+            ).in_boolean_mode()
+        return match(self.model.name, self.model.short_description, self.model.description, against=q).in_natural_language_mode()
 
+    def apply_filters(self, query: Query, filters: Optional[Dict[str, Any]] = None) -> Query:
         if filters:
             if "category_id" in filters and filters["category_id"]:
                 query = query.filter(self.model.category_id == filters["category_id"])
@@ -46,14 +270,151 @@ class CRUDProduct(CRUDBase[Product, ProductCreate, ProductUpdate]):
                 query = query.filter(self.model.status == filters["status"])
             if "featured" in filters and filters["featured"] is not None:
                 query = query.filter(self.model.featured == filters["featured"])
-            # Add more filters as needed: name search, price range, etc.
+            if filters.get("price_min") is not None:
+                query = query.filter(self.model.effective_price >= filters["price_min"])
+            if filters.get("price_max") is not None:
+                query = query.filter(self.model.effective_price <= filters["price_max"])
+            if filters.get("search"):
+                # Full-text filter (MySQL only, see fulltext_match)
+                query = query.filter(self.fulltext_match(filters["search"], filters.get("search_mode", "natural")))
+        return query
+
+    def get_keyset_keys(self, sort: str = "-id") -> List[KeysetKey]:
+        """Keyset ordering for a PRODUCT_SORTS key: the sort column, then id in the same direction."""
+        if sort not in PRODUCT_SORTS:
+            raise ValueError(f"Unsupported sort: {sort}")
+        name, descending = PRODUCT_SORTS[sort]
+        keys = [keyset_key(self.model.id, descending=descending)]
+        if name is not None:
+            keys.insert(0, keyset_key(getattr(self.model, name), descending=descending))
+        return keys
+
+    def get_multi_paginated(
+        self, db: Session, *, skip: int = 0, limit: int = 100, filters: Optional[Dict[str, Any]] = None,
+        sort: str = "-id", with_details: bool = True
+    ) -> Tuple[List[Product], int]:
+        """
+        Ordered by `sort` (PRODUCT_SORTS, newest first by default), the order get_multi_by_cursor
+        pages through. With a "search" filter, most relevant first (one query on the FULLTEXT index).
+        """
+        query = self.apply_filters(db.query(self.model), filters)
+        order_by = [key.column.desc() if key.descending else key.column.asc() for key in self.get_keyset_keys(sort)]
+        if filters and filters.get("search"):
+            # MySQL evaluates the MATCH of the WHERE clause once for both uses
+            order_by.insert(0, self.fulltext_match(filters["search"], filters.get("search_mode", "natural")).desc())
 
         total = query.count()
-        items = query.order_by(self.model.id.desc()).offset(skip).limit(limit).options(
-            joinedload(self.model.category),
+        items = query.order_by(*order_by).offset(skip).limit(limit).options(
+            *self.list_options(with_details)
         ).all()
         return items, total
 
+    def get_facets(
+        self, db: Session, *, facets: List[str], filters: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Number of products matching `filters` (those of get_multi_paginated) per value of each of
+        `facets` (PRODUCT_FACETS), in one statement: a grouped SELECT per facet over the filtered
+        products, combined with UNION ALL, so every facet counts the same products and each count
+        is what filtering on that value returns. "price" counts per PRODUCT_PRICE_FACET_BOUNDS
+        bucket of effective_price (with the bucket's min/max), "tags" the products carrying each
+        tag. Values are ordered by count, highest first; price buckets by price.
+        """
+        bounds = settings.product_price_facet_bounds
+        columns = {}
+        for name in facets:
+            if name == "price":
+                price = self.model.effective_price
+                columns[name] = case(*[(price < bound, index) for index, bound in enumerate(bounds)], else_=len(bounds))
+            else:
+                columns[name] = getattr(self.model, name)
+        # UNION ALL needs one type for the value column; converted back per facet below
+        as_value = lambda column: cast(column, Unicode(255))
+
+        # Filtered once for every facet (the price CASE and its parameters included)
+        matching = self.apply_filters(
+            db.query(self.model.id, *(column.label(name) for name, column in columns.items())), filters
+        ).cte("matching")
+        selects = []
+        for name in columns:
+            if name == "tags":
+                elements, tag = self.tag_elements(db, matching.c.tags)
+                selects.append(
+                    select(literal(name).label("facet"), as_value(tag).label("value"), func.count(distinct(matching.c.id)).label("count"))
+                    .select_from(join(matching, elements, true())).where(tag.isnot(None)).group_by(tag)
+                )
+            else:
+                column = matching.c[name]
+                selects.append(
+                    select(literal(name).label("facet"), as_value(column).label("value"), func.count().label("count"))
+                    .select_from(matching).group_by(column)
+                )
+        rows = db.execute(union_all(*selects)).all() if selects else []
+
+        counts: Dict[str, Dict[Any, int]] = {name: {} for name in facets}
+        for row in rows:
+            value = row.value
+            if value is not None and row.facet in ("category_id", "price"):
+                value = int(value)
+            elif value is not None and row.facet == "featured":
+                value = value in ("1", "true")
+            counts[row.facet][value] = row.count
+
+        result = {}
+        for name, by_value in counts.items():
+            if name == "price":
+                edges = [0.0, *bounds, None]
+                result[name] = [
+                    {
+                        "value": f"{edges[index]:g}-{edges[index + 1]:g}" if edges[index + 1] is not None else f"{edges[index]:g}-",
+                        "count": count, "min": edges[index], "max": edges[index + 1],
+                    }
+                    for index, count in sorted(by_value.items())
+                ]
+            else:
+                result[name] = [
+                    {"value": value, "count": count}
+                    for value, count in sorted(by_value.items(), key=lambda item: (-item[1], str(item[0])))
+                ]
+        return result
+
+    def tag_elements(self, db: Session, tags: Any) -> Tuple[Any, Any]:
+        """
+        Table function with one row per element of the JSON list column `tags` (joined laterally
+        to the table `tags` belongs to, with sqlalchemy.join: CROSS APPLY on SQL Server), and its
+        element column.
+        """
+        dialect = db.get_bind().dialect.name
+        if dialect == "mysql":
+            elements = func.json_table(tags, literal_column("'$[*]' COLUMNS (tag VARCHAR(255) PATH '$')")).table_valued("tag")
+            return elements, elements.c.tag
+        if dialect == "sqlite":
+            elements = func.json_each(tags).table_valued("value")
+            return elements, elements.c.value
+        if dialect == "mssql":
+            # JSON_QUERY is NULL (no rows) for the JSON null stored for products without tags
+            elements = func.openjson(func.json_query(tags)).table_valued("value")
+            return elements, elements.c.value
+        raise ValueError(f"The tags facet is not supported on {dialect}")
+
+    def get_multi_by_cursor(
+        self, db: Session, *, limit: int = 100, cursor: Optional[str] = None,
+        filters: Optional[Dict[str, Any]] = None, sort: str = "-id", with_details: bool = True
+    ) -> Tuple[List[Product], int, Optional[str]]:
+        """
+        Keyset-paginated variant of get_multi_paginated (same filters and ordering).
+        Returns the page, the total matching the filters and the cursor of the next page.
+        Raises ValueError for an invalid cursor.
+        """
+        query = self.apply_filters(db.query(self.model), filters)
+
+        total = query.count()
+        items, next_cursor = paginate_keyset(
+            query.options(*self.list_options(with_details)),
+            self.get_keyset_keys(sort), sort=sort, limit=limit, cursor=cursor
+        )
+        return items, total, next_cursor
+
     def create(self, db: Session, *, obj_in: ProductCreate, created_by_user_id: Optional[int] = None) -> Product:
         # Auto-generate slug if not provided or ensure it's unique
         if not obj_in.slug:
@@ -92,11 +453,12 @@ class CRUDProduct(CRUDBase[Product, ProductCreate, ProductUpdate]):
             db.commit()
             db.refresh(db_product)
             db.refresh(db_product, attribute_names=['images', 'variants', 'category'])
-            return db_product
         except Exception as e:
             db.rollback()
             # Log error e
             raise e
+        self.index_product(db_product)
+        return db_product
 
 
     def update(
@@ -150,30 +512,265 @@ class CRUDProduct(CRUDBase[Product, ProductCreate, ProductUpdate]):
             db.commit()
             db.refresh(db_obj)
             db.refresh(db_obj, attribute_names=['images', 'variants', 'category'])
-            return db_obj
         except Exception as e:
             db.rollback()
             raise e
+        finally:
+            self.invalidate_detail(db_obj.id)
+        self.index_product(db_obj)
+        return db_obj
+
+    def remove(self, db: Session, *, id: int) -> Optional[Product]:
+        try:
+            product = super().remove(db, id=id)
+        finally:
+            self.invalidate_detail(id)
+        product_search_index.remove(id)
+        return product
+
+    def remove_obj(self, db: Session, *, db_obj: Product) -> Product:
+        product_id = db_obj.id
+        try:
+            product = super().remove_obj(db, db_obj=db_obj)
+        finally:
+            self.invalidate_detail(product_id)
+        product_search_index.remove(product_id)
+        return product
 
     # Methods for managing Product Images (example)
-    def add_product_image(self, db: Session, *, product: Product, image_in: ProductImageCreate) -> ProductImage:
+    def add_product_image(
+        self, db: Session, *, product: Product, image_in: ProductImageCreate, storage_key: Optional[str] = None,
+        derivatives: Optional[Dict[str, Dict[str, str]]] = None, content_hash: Optional[str] = None,
+        placeholder: Optional[str] = None
+    ) -> ProductImage:
+        """
+        Add an image to a product. With `content_hash` (sha256 of the upload) the files just stored
+        under it are registered on its MediaBlob, locked by the caller before storing them (see
+        lock_upload_blobs), with one reference; if this fails they are deleted before the lock is
+        released.
+        """
         # Solo pasa los campos válidos para ProductImage
         image_data = image_in.model_dump()
         image_data.pop("filename", None)  # Elimina filename si existe
-        db_image = ProductImage(**image_data, product_id=product.id)
+        db_image = ProductImage(
+            **image_data, product_id=product.id, storage_key=storage_key, derivatives=derivatives, placeholder=placeholder
+        )
+        claimed = False
         try:
+            if content_hash:
+                blob = self.lock_upload_blobs(db, content_hashes=[content_hash])[content_hash]
+                claimed = not blob.ref_count
+                if claimed:
+                    blob.storage_key, blob.derivatives, blob.placeholder = storage_key, derivatives, placeholder
+                blob.ref_count += 1
+                db_image.blob = blob
             db.add(db_image)
             db.commit()
             db.refresh(db_image)
             return db_image
         except Exception as e:
+            if claimed:
+                self.delete_blob_files(MediaBlob(storage_key=storage_key, derivatives=derivatives))
+            db.rollback()
+            raise e
+        finally:
+            self.invalidate_detail(product.id)
+
+    def add_product_image_from_blob(
+        self, db: Session, *, product: Product, content_hash: str, alt: Optional[str] = None,
+        display_order: Optional[int] = 0, is_main: bool = False
+    ) -> Optional[ProductImage]:
+        """
+        Add an image that reuses an already stored upload with the same content hash: takes a
+        reference on its MediaBlob and inserts the ProductImage in one transaction, without any
+        image processing. Returns None (nothing written) if no such upload is stored.
+        """
+        try:
+            # Atomic increment; the files of a blob whose count is 0 may be gone (see purge_blob)
+            acquired = (
+                db.query(MediaBlob)
+                .filter(MediaBlob.content_hash == content_hash, MediaBlob.ref_count > 0)
+                .update({MediaBlob.ref_count: MediaBlob.ref_count + 1}, synchronize_session=False)
+            )
+            if not acquired:
+                db.rollback()
+                return None
+            blob = db.query(MediaBlob).filter(MediaBlob.content_hash == content_hash).one()
+            db_image = ProductImage(
+                url=get_storage().url(blob.storage_key), alt=alt, display_order=display_order, is_main=is_main,
+                product_id=product.id, storage_key=blob.storage_key, derivatives=blob.derivatives,
+                placeholder=blob.placeholder, blob_id=blob.id
+            )
+            db.add(db_image)
+            db.commit()
+            db.refresh(db_image)
+            return db_image
+        except Exception as e:
+            db.rollback()
+            raise e
+        finally:
+            self.invalidate_detail(product.id)
+
+    def get_stored_hashes(self, db: Session, *, content_hashes: List[str]) -> Set[str]:
+        """The content hashes among `content_hashes` that already have a stored upload (MediaBlob)."""
+        if not content_hashes:
+            return set()
+        rows = db.query(MediaBlob.content_hash).filter(
+            MediaBlob.content_hash.in_(content_hashes), MediaBlob.ref_count > 0
+        ).all()
+        return {row.content_hash for row in rows}
+
+    def add_product_images(
+        self, db: Session, *, product_id: int, images: List[Dict[str, Any]]
+    ) -> List[Optional[ProductImage]]:
+        """
+        Add several uploaded images to a product in one transaction. Each entry has alt,
+        display_order, is_main and content_hash, plus storage_key/derivatives/placeholder if its files were
+        just stored (under the lock of its MediaBlob, see lock_upload_blobs); entries without them
+        reuse the stored upload of their hash. Each hash takes all its references at once.
+        Returns the images in the order of `images`; None for an entry that had no files and
+        whose stored upload is gone (deleted since it was looked up). If this fails, the files
+        stored for it are deleted before the locks are released.
+        """
+        by_hash: Dict[str, List[Dict[str, Any]]] = {}
+        for entry in images:
+            by_hash.setdefault(entry["content_hash"], []).append(entry)
+        claimed: Dict[str, Dict[str, Any]] = {} # content_hash -> entry with the files stored for it
+        try:
+            blobs = self.lock_upload_blobs(db, content_hashes=list(by_hash))
+            for content_hash, entries in by_hash.items():
+                blob = blobs[content_hash]
+                stored = next((entry for entry in entries if entry.get("storage_key")), None)
+                if stored is not None and not blob.ref_count:
+                    claimed[content_hash] = stored
+                    blob.storage_key, blob.derivatives, blob.placeholder = (
+                        stored["storage_key"], stored.get("derivatives"), stored.get("placeholder")
+                    )
+                elif not blob.ref_count:
+                    # Deleted since it was looked up: drop the row inserted to lock it
+                    if not blob.storage_key:
+                        db.delete(blob)
+                    del blobs[content_hash]
+                    continue
+                blob.ref_count += len(entries)
+            storage = get_storage()
+            created: List[Optional[ProductImage]] = []
+            for entry in images:
+                blob = blobs.get(entry["content_hash"])
+                if blob is None:
+                    created.append(None)
+                    continue
+                db_image = ProductImage(
+                    url=storage.url(blob.storage_key), alt=entry.get("alt"), display_order=entry.get("display_order"),
+                    is_main=entry.get("is_main", False), product_id=product_id, storage_key=blob.storage_key,
+                    derivatives=blob.derivatives, placeholder=blob.placeholder, blob=blob
+                )
+                db.add(db_image)
+                created.append(db_image)
+            db.flush()
+            ids = [image.id for image in created if image is not None]
+            db.commit()
+            if ids:
+                # Reload the committed rows with one SELECT instead of a refresh per image
+                db.query(ProductImage).filter(ProductImage.id.in_(ids)).all()
+            return created
+        except Exception as e:
+            for stored in claimed.values():
+                self.delete_blob_files(MediaBlob(storage_key=stored["storage_key"], derivatives=stored.get("derivatives")))
             db.rollback()
             raise e
+        finally:
+            self.invalidate_detail(product_id)
+
+    def lock_upload_blobs(self, db: Session, *, content_hashes: List[str]) -> Dict[str, MediaBlob]:
+        """
+        Lock the MediaBlob row of each of `content_hashes` (in hash order) in the caller's
+        transaction, first inserting an unreferenced one (ref_count 0) for a hash without.
+        The files of an upload are stored under its hash and registered, and deleted by purge_blob,
+        only while holding this lock, so removals and concurrent uploads of the same file never
+        interleave on those keys. A blob with references has its files (reuse them); one without
+        needs them stored. The locks last until the caller commits or rolls back.
+        """
+        blobs: Dict[str, MediaBlob] = {}
+        for content_hash in sorted(set(content_hashes)):
+            rows = db.query(MediaBlob).filter(MediaBlob.content_hash == content_hash)
+            conflicted = False
+            while content_hash not in blobs:
+                # A new hash is inserted rather than looked up with a locking read, which would take
+                # a gap lock on MySQL (deadlocking concurrent inserts of other new hashes)
+                if conflicted or db.query(MediaBlob.id).filter(MediaBlob.content_hash == content_hash).first():
+                    # Row lock of a no-op update (FOR UPDATE is not rendered for SQL Server)
+                    if rows.update({MediaBlob.ref_count: MediaBlob.ref_count}, synchronize_session=False):
+                        blobs[content_hash] = rows.populate_existing().one()
+                        continue
+                try:
+                    with db.begin_nested():
+                        blob = MediaBlob(content_hash=content_hash, storage_key="", ref_count=0)
+                        db.add(blob)
+                    blobs[content_hash] = blob
+                except IntegrityError:
+                    # Inserted by a concurrent upload (this insert waited for it to commit)
+                    conflicted = True
+        return blobs
+
+    def abandon_uploads(self, db: Session, *, uploads: Dict[str, Tuple[str, Dict[str, Dict[str, str]]]]) -> None:
+        """
+        Delete the files this transaction stored for blobs it locked without references
+        ({content_hash: (storage_key, derivatives)}, e.g. when the request failed before
+        registering them), then roll back, releasing the locks.
+        """
+        for storage_key, derivatives in uploads.values():
+            self.delete_blob_files(MediaBlob(storage_key=storage_key, derivatives=derivatives))
+        db.rollback()
+
+    def release_image_blob(self, db: Session, *, blob_id: int) -> Optional[MediaBlob]:
+        """
+        Drop one reference on a MediaBlob (in the caller's transaction, not committed).
+        Returns the blob if that was the last reference; the caller then deletes it and its
+        files with purge_blob after committing.
+        """
+        db.query(MediaBlob).filter(MediaBlob.id == blob_id).update(
+            {MediaBlob.ref_count: MediaBlob.ref_count - 1}, synchronize_session=False
+        )
+        blob = db.query(MediaBlob).filter(MediaBlob.id == blob_id).populate_existing().first()
+        if blob is not None and blob.ref_count <= 0:
+            return blob
+        return None
+
+    def purge_blob(self, db: Session, *, blob_id: int) -> None:
+        """
+        Delete an unreferenced MediaBlob and its files, under its lock (see lock_upload_blobs):
+        an upload of the same file either registered it again first (nothing is deleted) or
+        stores its files once this has committed.
+        """
+        try:
+            rows = db.query(MediaBlob).filter(MediaBlob.id == blob_id)
+            # Row lock of a no-op update, as in lock_upload_blobs
+            locked = rows.update({MediaBlob.ref_count: MediaBlob.ref_count}, synchronize_session=False)
+            blob = rows.populate_existing().first() if locked else None
+            if blob is not None and blob.ref_count <= 0:
+                self.delete_blob_files(blob)
+                db.delete(blob)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            raise e
+
+    def delete_blob_files(self, blob: MediaBlob) -> None:
+        """Best effort: a file left behind only wastes space."""
+        storage = get_storage()
+        keys = [blob.storage_key] + [key for by_width in (blob.derivatives or {}).values() for key in by_width.values()]
+        for key in keys:
+            try:
+                storage.delete(key)
+            except Exception:
+                pass
 
     def update_product_image(self, db: Session, *, image_db: ProductImage, image_in: ProductImageUpdate) -> ProductImage:
         update_data = image_in.model_dump(exclude_unset=True)
         for field, value in update_data.items():
             setattr(image_db, field, value)
+        product_id = image_db.product_id
         try:
             db.add(image_db)
             db.commit()
@@ -182,30 +779,58 @@ class CRUDProduct(CRUDBase[Product, ProductCreate, ProductUpdate]):
         except Exception as e:
             db.rollback()
             raise e
+        finally:
+            self.invalidate_detail(product_id)
 
     def get_product_image(self, db: Session, *, image_id: int) -> Optional[ProductImage]:
         return db.query(ProductImage).filter(ProductImage.id == image_id).first()
 
     def remove_product_image(self, db: Session, *, image_id: int) -> Optional[ProductImage]:
+        """
+        Delete an image. Its shared upload (MediaBlob) loses a reference; the blob and its
+        files are deleted only when this was the last image using it.
+        """
         image = self.get_product_image(db, image_id=image_id)
         if image:
+            product_id = image.product_id
+            released = None
             try:
                 db.delete(image)
+                if image.blob_id is not None:
+                    released = self.release_image_blob(db, blob_id=image.blob_id)
                 db.commit()
-                return image
             except Exception as e:
                 db.rollback()
                 raise e
+            finally:
+                self.invalidate_detail(product_id)
+            if released is not None:
+                self.purge_blob(db, blob_id=released.id)
+            return image
         return None
 
+    def get_stock_histories(self, db: Session, *, product_id: int) -> List[StockHistory]:
+        return (
+            db.query(StockHistory)
+            .filter(StockHistory.product_id == product_id)
+            .order_by(StockHistory.date.desc())
+            .all()
+        )
+
     # Similar methods for Product Variants can be added here:
     # add_product_variant, update_product_variant, get_product_variant, remove_product_variant
 
 product_service = CRUDProduct(Product)
 get_multi_paginated = product_service.get_multi_paginated
+get_facets = product_service.get_facets
 create = product_service.create
 get = product_service.get
 update = product_service.update
 add_product_image = product_service.add_product_image
 add_product_image = product_service.add_product_image
-add_product_image = product_service.add_product_image
\ No newline at end of file
+add_product_image = product_service.add_product_image
+add_product_image_from_blob = product_service.add_product_image_from_blob
+remove_product_image = product_service.remove_product_image
+
+# Awaitable variant used by the async endpoints
+async_product_service = AsyncCRUDBase(product_service)
@@ -1,19 +1,74 @@
 from typing import Any, Dict, Optional, Union, List
 
-from sqlalchemy.orm import Session
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException, status
 
-from app.services.base import CRUDBase
+from app.core.config import settings
+from app.services.base import CRUDBase, AsyncCRUDBase, run_in_session
 from app.models.user import User
 from app.schemas.user import UserCreate, UserUpdate, UserInDB
-from app.core.security import get_password_hash, verify_password
+from app.schemas.token import Principal
+from app.core.security import (
+    get_password_hash, verify_and_update_password, get_password_hash_async, verify_and_update_password_async
+)
+from app.utils.cache import TTLCache
+from app.utils.executor import ExecutorSaturatedError
+
+# Column values of authenticated users, keyed by email (the token subject)
+principal_cache = TTLCache(
+    "auth_principal", maxsize=settings.AUTH_PRINCIPAL_CACHE_MAX_ENTRIES, ttl=settings.AUTH_PRINCIPAL_CACHE_TTL_SECONDS
+)
 
 
 class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
+    def __init__(self, model):
+        super().__init__(model)
+        # Bumped on every invalidation; a user loaded before a write must not be cached after it
+        self.principal_generation = 0
+
+    # --- Authenticated principal cache ---
+    def get_cached_principal(self, email: str) -> Optional[User]:
+        """
+        A fresh detached User built from the cached column values, or None.
+        Each call returns its own instance, so it can be attached to the request's session
+        (e.g. to update it) without being shared between concurrent requests.
+        """
+        snapshot = principal_cache.get(email)
+        if snapshot is None:
+            return None
+        user = User(**snapshot)
+        make_transient_to_detached(user)
+        return user
+
+    def cache_principal(self, user: User, generation: int) -> None:
+        if generation != self.principal_generation:
+            return
+        snapshot = {attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs}
+        principal_cache.set(user.email, snapshot)
+
+    def invalidate_principal(self, *emails: Optional[str]) -> None:
+        self.principal_generation += 1
+        for email in emails:
+            if email:
+                principal_cache.delete(email)
+
+    # --- Access token claims ---
+    TOKEN_BOUND_FIELDS = ("hashed_password", "role", "status", "email")
+
+    def token_claims(self, user: User) -> Dict[str, Any]:
+        """Revocation claim for an access token (see JWT_PRINCIPAL_CLAIMS)."""
+        return {"ver": user.token_version or 0}
+
     def get_by_email(self, db: Session, *, email: str) -> Optional[User]:
         return db.query(User).filter(User.email == email).first()
 
-    def create(self, db: Session, *, obj_in: UserCreate) -> User:
+    def create(self, db: Session, *, obj_in: UserCreate, hashed_password: Optional[str] = None) -> User:
+        """
+        Create a user from `obj_in`; pass `hashed_password` if the password was already
+        hashed (e.g. on the password pool by AsyncCRUDUser) to skip hashing here.
+        """
         # Check if user already exists
         existing_user = self.get_by_email(db, email=obj_in.email)
         if existing_user:
@@ -23,7 +78,8 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
                 detail="The user with this email already exists in the system.",
             )
 
-        hashed_password = get_password_hash(obj_in.password)
+        if hashed_password is None:
+            hashed_password = get_password_hash(obj_in.password)
 
         # Create a dictionary for user creation, excluding the plain password
         user_data = obj_in.model_dump(exclude={"password"})
@@ -75,7 +131,33 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
             del update_data["password"] # Remove plain password from update_data
             update_data["hashed_password"] = hashed_password # Add hashed password
 
-        return super().update(db, db_obj=db_obj, obj_in=update_data)
+        # Credential and privilege changes revoke the tokens already issued
+        if any(key in update_data and update_data[key] != getattr(db_obj, key) for key in self.TOKEN_BOUND_FIELDS):
+            update_data["token_version"] = (db_obj.token_version or 0) + 1
+
+        # Any change (status, role, email, password, ...) must be visible to the next authenticated request:
+        # the new values (token_version included) are written to the principal cache, not just dropped
+        old_email = db_obj.email
+        try:
+            user = super().update(db, db_obj=db_obj, obj_in=update_data)
+        except Exception:
+            self.invalidate_principal(old_email, update_data.get("email"))
+            raise
+        self.invalidate_principal(old_email)
+        self.cache_principal(user, self.principal_generation)
+        return user
+
+    def remove(self, db: Session, *, id: int) -> Optional[User]:
+        user = super().remove(db, id=id)
+        self.invalidate_principal(user.email if user else None)
+        return user
+
+    def remove_obj(self, db: Session, *, db_obj: User) -> User:
+        email = db_obj.email
+        try:
+            return super().remove_obj(db, db_obj=db_obj)
+        finally:
+            self.invalidate_principal(email)
 
     def authenticate(
         self, db: Session, *, email: str, password: str
@@ -87,25 +169,92 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
         if not user.hashed_password:
             return None
         try:
-            if not verify_password(password, user.hashed_password):
-                return None
+            verified, new_hash = verify_and_update_password(password, user.hashed_password)
         except Exception:
             # Si el hash no es válido, también retorna None
             return None
+        if not verified:
+            return None
+        if new_hash:
+            self.upgrade_password_hash(db, user=user, hashed_password=new_hash)
+        return user
+
+    def upgrade_password_hash(self, db: Session, *, user: User, hashed_password: str) -> User:
+        """
+        Persist a rehashed password (outdated scheme or cost, see security.build_pwd_context).
+        Best effort: a failure here must not fail the login, the upgrade is retried next time.
+        """
+        try:
+            user.hashed_password = hashed_password
+            db.add(user)
+            db.commit()
+            db.refresh(user)
+        except Exception:
+            db.rollback()
+        finally:
+            self.invalidate_principal(user.email)
         return user
 
     def is_active(self, user: User) -> bool:
         return user.status == "active"
 
-    # Example: Check if user is a superuser/admin (based on role)
-    # def is_superuser(self, user: User) -> bool:
-    #     return user.role == "Administrador" # Or whatever your admin role is named
+    # Superuser/admin check (based on role); takes a User or a Principal
+    def is_superuser(self, user: Union[User, Principal]) -> bool:
+        return user.role == "Administrador"
 
     # You can add more user-specific methods here, e.g.,
     # - Change user password
     # - Activate/deactivate user
     # - Get all users with a specific role
 
+
+
+class AsyncCRUDUser(AsyncCRUDBase[User, UserCreate, UserUpdate]):
+    """
+    Awaitable user service. The bcrypt work of authenticate/create/update runs on the
+    dedicated password pool (app.core.security.password_executor) instead of the event loop
+    (async sessions run service code on the loop) or the shared threadpool; the DB work still
+    goes through the wrapped CRUDUser.
+    """
+    async def authenticate(self, db: Union[Session, AsyncSession], *, email: str, password: str) -> Optional[User]:
+        user = await self.get_by_email(db, email=email)
+        if not user:
+            return None
+        if not user.hashed_password:
+            return None
+        try:
+            verified, new_hash = await verify_and_update_password_async(password, user.hashed_password)
+        except ExecutorSaturatedError:
+            raise
+        except Exception:
+            # Si el hash no es válido, también retorna None
+            return None
+        if not verified:
+            return None
+        if new_hash:
+            user = await self.upgrade_password_hash(db, user=user, hashed_password=new_hash)
+        return user
+
+    async def create(self, db: Union[Session, AsyncSession], *, obj_in: UserCreate) -> User:
+        # Reject duplicates before paying for the hash; CRUDUser.create checks again
+        if await self.get_by_email(db, email=obj_in.email):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="The user with this email already exists in the system.",
+            )
+        hashed_password = await get_password_hash_async(obj_in.password)
+        return await run_in_session(db, self.crud.create, obj_in=obj_in, hashed_password=hashed_password)
+
+    async def update(self, db: Union[Session, AsyncSession], *, db_obj: User, obj_in: Union[UserUpdate, Dict[str, Any]]) -> User:
+        if isinstance(obj_in, dict):
+            update_data = dict(obj_in)
+        else:
+            update_data = obj_in.model_dump(exclude_unset=True)
+        if update_data.get("password"):
+            update_data["hashed_password"] = await get_password_hash_async(update_data.pop("password"))
+        return await run_in_session(db, self.crud.update, db_obj=db_obj, obj_in=update_data)
+
+
 user_service = CRUDUser(User)
 
 # Exponer authenticate como función de módulo para compatibilidad con imports existentes
@@ -115,3 +264,7 @@ get_multi = user_service.get_multi
 create = user_service.create
 get = user_service.get
 update = user_service.update
+token_claims = user_service.token_claims
+
+# Awaitable variant used by the async endpoints
+async_user_service = AsyncCRUDUser(user_service)
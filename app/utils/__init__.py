@@ -1,23 +1,31 @@
 import re
 from typing import Optional
 
+def fold_text(text: str) -> str:
+    """
+    Lowercase `text` and remove accents (basic version), so "Ñandú" and "nandu" compare equal.
+    Shared by slugs and the search index.
+    """
+    # Convert to lowercase
+    text = text.lower()
+    # Remove accents and special characters (basic version)
+    text = re.sub(r'[àáâãäå]', 'a', text)
+    text = re.sub(r'[èéêë]', 'e', text)
+    text = re.sub(r'[ìíîï]', 'i', text)
+    text = re.sub(r'[òóôõö]', 'o', text)
+    text = re.sub(r'[ùúûü]', 'u', text)
+    text = re.sub(r'[ýÿ]', 'y', text)
+    text = re.sub(r'[ñ]', 'n', text)
+    text = re.sub(r'[ç]', 'c', text)
+    return text
+
 def generate_slug(text: str, separator: str = '-') -> str:
     """
     Generate a URL-friendly slug from a given text string.
     """
     if not text:
         return ""
-    # Convert to lowercase
-    slug = text.lower()
-    # Remove accents and special characters (basic version)
-    slug = re.sub(r'[àáâãäå]', 'a', slug)
-    slug = re.sub(r'[èéêë]', 'e', slug)
-    slug = re.sub(r'[ìíîï]', 'i', slug)
-    slug = re.sub(r'[òóôõö]', 'o', slug)
-    slug = re.sub(r'[ùúûü]', 'u', slug)
-    slug = re.sub(r'[ýÿ]', 'y', slug)
-    slug = re.sub(r'[ñ]', 'n', slug)
-    slug = re.sub(r'[ç]', 'c', slug)
+    slug = fold_text(text)
     # Replace non-alphanumeric characters (except separator) with the separator
     slug = re.sub(r'[^a-z0-9]+', separator, slug)
     # Remove leading/trailing separators
@@ -0,0 +1,126 @@
+"""
+Compute the blurred placeholder of product images stored before placeholders existed.
+
+    python -m app.utils.backfill_image_placeholders [--batch-size 100] [--workers 4]
+
+Images in the media storage (storage_key set) without a placeholder are paged by id; each batch
+is rendered on a process pool from the smallest stored rendition and written in one short
+transaction, together with the MediaBlob the image shares. Only rows that still have no
+placeholder are selected, so the command can be stopped and rerun at any time (API workers show
+the placeholders once their product detail cache entries expire).
+Images with external URLs are skipped; run migrate_data_url_images first for inline data URLs.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import update
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.media_blob import MediaBlob
+from app.models.product_image import ProductImage
+from app.utils.images import render_placeholder
+from app.utils.storage import get_storage
+
+
+def smallest_rendition_key(storage_key: str, derivatives: Optional[Dict[str, Dict[str, str]]]) -> str:
+    """The key of the narrowest stored derivative (cheapest to decode), or the full-size file."""
+    candidates = [(int(width), key) for by_width in (derivatives or {}).values() for width, key in by_width.items()]
+    return min(candidates)[1] if candidates else storage_key
+
+
+def placeholder_one(
+    image_id: int, storage_key: str, derivatives: Optional[Dict[str, Dict[str, str]]]
+) -> Tuple[int, Optional[str], Optional[str]]:
+    """Worker job: returns (image_id, placeholder, None) or (image_id, None, error)."""
+    storage = get_storage()
+    key = smallest_rendition_key(storage_key, derivatives)
+    try:
+        source = storage.local_path(key) or storage.open(key)
+        return image_id, render_placeholder(source, settings.IMAGE_PLACEHOLDER_SIZE), None
+    except (ValueError, OSError) as e:
+        return image_id, None, str(e)
+
+
+def fetch_batch(last_id: int, batch_size: int) -> List[Tuple[int, str, Any, Optional[int]]]:
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(ProductImage.id, ProductImage.storage_key, ProductImage.derivatives, ProductImage.blob_id)
+            .filter(ProductImage.id > last_id, ProductImage.storage_key.isnot(None), ProductImage.placeholder.is_(None))
+            .order_by(ProductImage.id)
+            .limit(batch_size)
+            .all()
+        )
+        return [(row.id, row.storage_key, row.derivatives, row.blob_id) for row in rows]
+    finally:
+        db.close()
+
+def apply_batch(results: List[Dict[str, Any]]) -> None:
+    """Store the placeholders in one transaction (only on rows and blobs that still lack one)."""
+    db = SessionLocal()
+    try:
+        for values in results:
+            db.execute(
+                update(ProductImage)
+                .where(ProductImage.id == values["id"], ProductImage.placeholder.is_(None))
+                .values(placeholder=values["placeholder"])
+            )
+            if values["blob_id"] is not None:
+                db.execute(
+                    update(MediaBlob)
+                    .where(MediaBlob.id == values["blob_id"], MediaBlob.placeholder.is_(None))
+                    .values(placeholder=values["placeholder"])
+                )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def run(batch_size: int, workers: int) -> Dict[str, Any]:
+    progress: Dict[str, Any] = {"last_id": 0, "done": 0, "failed": []}
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        while True:
+            # Failed rows stay without a placeholder; last_id keeps this run from fetching them again
+            batch = fetch_batch(progress["last_id"], batch_size)
+            if not batch:
+                break
+            blob_ids = {image_id: blob_id for image_id, _, _, blob_id in batch}
+            results = []
+            for image_id, placeholder, error in pool.map(placeholder_one, *zip(*(row[:3] for row in batch))):
+                if placeholder is None:
+                    progress["failed"].append({"id": image_id, "error": error})
+                else:
+                    results.append({"id": image_id, "placeholder": placeholder, "blob_id": blob_ids[image_id]})
+            apply_batch(results)
+            progress["last_id"] = batch[-1][0]
+            progress["done"] += len(results)
+            print(f"Processed up to id {progress['last_id']}: {progress['done']} done, {len(progress['failed'])} failed")
+    return progress
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compute missing product image placeholders.")
+    parser.add_argument("--batch-size", type=int, default=100, help="Rows per transaction (default: 100)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Parallel image workers")
+    args = parser.parse_args(argv)
+
+    if not settings.IMAGE_PLACEHOLDER_SIZE:
+        print("IMAGE_PLACEHOLDER_SIZE is 0: placeholders are disabled")
+        return 1
+    progress = run(args.batch_size, args.workers)
+    print(f"Done: {progress['done']} placeholders computed, {len(progress['failed'])} failed")
+    for failure in progress["failed"]:
+        print(f"  image {failure['id']}: {failure['error']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
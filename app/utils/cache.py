@@ -0,0 +1,85 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+# Every cache registers itself here by name, so its counters can be exposed for monitoring
+caches: Dict[str, "TTLCache"] = {}
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Thread-safe, size-bounded LRU cache whose entries also expire after a TTL.
+    `maxsize <= 0` disables the cache (every lookup is a miss, nothing is stored).
+    Keeps hit/miss/eviction counters; see `stats()`.
+    """
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict() # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0 # Dropped to make room (LRU)
+        self.expirations = 0 # Dropped because their TTL had passed
+        caches[name] = self
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store `value`; `ttl` overrides the cache TTL for this entry (e.g. capped by a token's exp)."""
+        if self.maxsize <= 0:
+            return
+        expires_at = time.monotonic() + (self.ttl if ttl is None else min(ttl, self.ttl))
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+# Example usage:
+# cache = TTLCache("example", maxsize=100, ttl=60)
+# cache.set("key", "value")
+# cache.get("key")  # -> "value"
+# cache.stats()     # -> {"size": 1, "hits": 1, ...}
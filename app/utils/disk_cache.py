@@ -0,0 +1,119 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from app.utils.cache import caches
+
+
+class DiskLRUCache:
+    """
+    Size-bounded LRU cache of files in a directory (one file per entry, named by a digest of the key).
+    The index is rebuilt from the directory (oldest mtime first) on first use, and recency is
+    kept in the file mtimes, so the cache survives restarts. Each process keeps its own index;
+    with several workers on one directory the bound is approximate.
+    """
+    def __init__(self, name: str, directory: str, max_bytes: int):
+        self.name = name
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        self._index: Optional["OrderedDict[str, int]"] = None # filename -> size, least recently used first
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        caches[name] = self
+
+    @staticmethod
+    def filename(key: str, extension: str = "") -> str:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return f"{digest}.{extension}" if extension else digest
+
+    def _load_index(self) -> "OrderedDict[str, int]":
+        if self._index is None:
+            os.makedirs(self.directory, exist_ok=True)
+            entries = []
+            for entry in os.scandir(self.directory):
+                if entry.is_file() and not entry.name.startswith(".tmp-"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, entry.name, stat.st_size))
+            self._index = OrderedDict((name, size) for _, name, size in sorted(entries))
+            self._size = sum(self._index.values())
+        return self._index
+
+    def _lookup(self, filename: str) -> Optional[str]:
+        """Path of a cached file, marked as recently used, or None. Called with the lock held."""
+        index = self._load_index()
+        if filename not in index:
+            self.misses += 1
+            return None
+        path = os.path.join(self.directory, filename)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # Removed by another process sharing the directory
+            self._size -= index.pop(filename)
+            self.misses += 1
+            return None
+        index.move_to_end(filename)
+        self.hits += 1
+        return path
+
+    def get(self, filename: str) -> Optional[str]:
+        """
+        Path of a cached file (marking it as recently used), or None.
+        A concurrent `put` may evict the file once this returns; use `read` to serve it.
+        """
+        with self._lock:
+            return self._lookup(filename)
+
+    def read(self, filename: str) -> Optional[bytes]:
+        """Contents of a cached file (marking it as recently used), or None. Read before anything can evict it."""
+        with self._lock:
+            path = self._lookup(filename)
+            if path is None:
+                return None
+            try:
+                with open(path, "rb") as f:
+                    return f.read()
+            except FileNotFoundError:
+                # Removed by another process sharing the directory, after the lookup
+                self._size -= self._index.pop(filename, 0)
+                return None
+
+    def put(self, filename: str, data: bytes) -> str:
+        """Store `data` (atomically) and return its path, evicting least recently used files past max_bytes."""
+        path = os.path.join(self.directory, filename)
+        with self._lock:
+            index = self._load_index()
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self._size += len(data) - index.pop(filename, 0)
+            index[filename] = len(data)
+            while self._size > self.max_bytes and len(index) > 1:
+                old_name, old_size = index.popitem(last=False)
+                try:
+                    os.remove(os.path.join(self.directory, old_name))
+                except FileNotFoundError:
+                    pass
+                self._size -= old_size
+                self.evictions += 1
+        return path
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._index) if self._index is not None else None,
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            }
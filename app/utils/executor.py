@@ -0,0 +1,120 @@
+import asyncio
+import functools
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+# Every executor registers itself here by name, so its counters can be exposed for monitoring
+executors: Dict[str, "BoundedExecutor"] = {}
+
+
+class ExecutorSaturatedError(RuntimeError):
+    """Raised when a BoundedExecutor already has as many jobs as it accepts."""
+
+
+class BoundedExecutor:
+    """
+    A thread or process pool for CPU-bound work called from async code, with a cap on
+    the number of jobs waiting for a worker. Submitting beyond `max_workers + max_queue`
+    jobs raises ExecutorSaturatedError right away instead of letting the backlog grow.
+    The pool is created on first use.
+    """
+    def __init__(self, name: str, *, kind: str = "thread", max_workers: int = 4, max_queue: int = 32,
+                 timeout: Optional[float] = None):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown executor kind: {kind}")
+        self.name = name
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout # Default per-job timeout in seconds (None = wait forever)
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self.in_flight = 0 # Submitted and not finished (running + queued)
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.job_seconds = 0.0 # Submit-to-finish time of finished jobs (queue wait included)
+        executors[name] = self
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    if self.kind == "process":
+                        # spawn: forking a process that runs threads (uvicorn, DB pools) is unsafe
+                        self._executor = ProcessPoolExecutor(
+                            max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+                        )
+                    else:
+                        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+        return self._executor
+
+    def _job_done(self, submitted_at: float, future) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            if future.cancelled():
+                return
+            self.job_seconds += time.monotonic() - submitted_at
+            if future.exception() is not None:
+                self.failed += 1
+            else:
+                self.completed += 1
+
+    async def run(self, fn: Callable[..., Any], *args, timeout: Optional[float] = None) -> Any:
+        """
+        Run `fn(*args)` in the pool and await its result.
+        With a process pool, `fn` and its arguments must be picklable (module-level functions).
+        Raises ExecutorSaturatedError if the queue is full and asyncio.TimeoutError if the job
+        takes longer than `timeout` (or the executor default). A job that already started keeps
+        its worker until it finishes; it counts against the queue until then.
+        """
+        with self._lock:
+            if self.in_flight >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise ExecutorSaturatedError(f"{self.name} is saturated")
+            self.in_flight += 1
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            with self._lock:
+                self.in_flight -= 1
+            raise
+        future.add_done_callback(functools.partial(self._job_done, time.monotonic()))
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.timed_out += 1
+            future.cancel() # Only effective if it has not started yet
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            finished = self.completed + self.failed
+            return {
+                "kind": self.kind,
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "in_flight": self.in_flight,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "avg_job_ms": round(self.job_seconds / finished * 1000, 2) if finished else None,
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_executors() -> None:
+    for executor in executors.values():
+        executor.shutdown()
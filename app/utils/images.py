@@ -0,0 +1,164 @@
+import base64
+import hashlib
+import io
+from typing import BinaryIO, Dict, List, Optional, Tuple, Union
+
+from PIL import Image, UnidentifiedImageError
+
+from app.core.config import settings
+from app.utils.disk_cache import DiskLRUCache
+from app.utils.executor import BoundedExecutor
+from app.utils.storage import StorageBackend, digest_key
+
+# Pool for the Pillow work of uploads; functions run on it must stay module-level (picklable)
+image_executor = BoundedExecutor(
+    "image_transcoding",
+    kind=settings.IMAGE_EXECUTOR,
+    max_workers=settings.IMAGE_WORKERS,
+    max_queue=settings.IMAGE_MAX_QUEUE,
+    timeout=settings.IMAGE_JOB_TIMEOUT_SECONDS,
+)
+
+# Output of GET /media/resize, keyed by storage key + size + format
+resize_cache = DiskLRUCache(
+    "image_resize", settings.IMAGE_RESIZE_CACHE_DIR, max_bytes=settings.IMAGE_RESIZE_CACHE_MAX_BYTES
+)
+
+# Derivative format -> (Pillow format, file extension)
+IMAGE_FORMATS = {
+    "jpeg": ("JPEG", "jpg"),
+    "webp": ("WEBP", "webp"),
+}
+
+
+def hash_upload(source: BinaryIO, chunk_size: int = 1024 * 1024) -> str:
+    """
+    sha256 hex digest of an uploaded file, read in chunks from its start (bounded memory).
+    The file is left at its start.
+    """
+    digest = hashlib.sha256()
+    source.seek(0)
+    for chunk in iter(lambda: source.read(chunk_size), b""):
+        digest.update(chunk)
+    source.seek(0)
+    return digest.hexdigest()
+
+
+def _open_rgb(source: Union[bytes, str], max_dimension: Optional[int] = None) -> Image.Image:
+    """
+    Decode `source` (bytes or a file path) to RGB/L, no larger than `max_dimension` on its long side.
+    For JPEGs, `draft` lets the decoder downscale by 1/2..1/8 while decoding, so a huge photo
+    never exists in memory at full resolution.
+    """
+    try:
+        img = Image.open(source if isinstance(source, str) else io.BytesIO(source))
+        if max_dimension and img.format == "JPEG":
+            img.draft("RGB", (max_dimension, max_dimension))
+        img.load()
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        raise ValueError(f"Unsupported image: {e}")
+    if img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    if max_dimension and max(img.size) > max_dimension:
+        img.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+    return img
+
+def _encode(img: Image.Image, fmt: str, quality: int) -> bytes:
+    output_stream = io.BytesIO()
+    img.save(output_stream, format=IMAGE_FORMATS[fmt][0], quality=quality)
+    return output_stream.getvalue()
+
+
+def _placeholder(img: Image.Image, size: int) -> str:
+    """A `size`px (long side) WebP of `img` as a data URL: ~100 bytes, shown blurred while the image loads."""
+    small = img.copy()
+    small.thumbnail((size, size), Image.Resampling.LANCZOS)
+    return "data:image/webp;base64," + base64.b64encode(_encode(small, "webp", 40)).decode("ascii")
+
+def render_placeholder(source: Union[bytes, str], size: int) -> str:
+    """Placeholder data URL (see _placeholder) for an image given as bytes or a file path."""
+    return _placeholder(_open_rgb(source, size), size)
+
+
+def transcode_to_jpeg(source: Union[bytes, str], quality: int = 70, max_dimension: Optional[int] = None) -> bytes:
+    """
+    Re-encode an uploaded image (bytes or a file path) as JPEG (flattening alpha/palette modes to RGB).
+    Raises ValueError if Pillow can't read it.
+    """
+    return _encode(_open_rgb(source, max_dimension), "jpeg", quality)
+
+def render_derivatives(
+    source: Union[bytes, str], widths: List[int], formats: List[str], quality: int = 70,
+    max_dimension: Optional[int] = None, placeholder_size: Optional[int] = None
+) -> Tuple[bytes, Dict[str, Dict[int, bytes]], Optional[str]]:
+    """
+    Decode an uploaded image (bytes or a file path) once and return
+    (full-size JPEG, {format: {width: bytes}}, placeholder data URL or None if `placeholder_size` is not set).
+    The full-size JPEG is capped at `max_dimension`. Widths are downscaled largest first, each from
+    the previous one (the placeholder from the smallest); widths that would upscale the original are skipped.
+    Raises ValueError if Pillow can't read the image.
+    """
+    img = _open_rgb(source, max_dimension)
+    main = _encode(img, "jpeg", quality)
+    derivatives: Dict[str, Dict[int, bytes]] = {fmt: {} for fmt in formats}
+    current = img
+    for width in sorted(set(widths), reverse=True):
+        if width >= img.width:
+            continue
+        height = max(1, round(img.height * width / img.width))
+        current = current.resize((width, height), Image.Resampling.LANCZOS)
+        for fmt in formats:
+            derivatives[fmt][width] = _encode(current, fmt, quality)
+    placeholder = _placeholder(current, placeholder_size) if placeholder_size else None
+    return main, derivatives, placeholder
+
+def resize_image(
+    source: Union[bytes, str], width: Optional[int], height: Optional[int], fmt: str, quality: int = 70
+) -> bytes:
+    """
+    Fit an image (bytes or a file path) into width x height (either may be None) keeping its
+    aspect ratio, never upscaling, and encode it as `fmt` (a key of IMAGE_FORMATS).
+    """
+    try:
+        img = Image.open(source if isinstance(source, str) else io.BytesIO(source))
+        if img.format == "JPEG":
+            img.draft("RGB", (width or img.width, height or img.height))
+        img.load()
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        raise ValueError(f"Unsupported image: {e}")
+    if img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    scale = min(width / img.width if width else 1.0, height / img.height if height else 1.0, 1.0)
+    size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+    if size != img.size:
+        img = img.resize(size, Image.Resampling.LANCZOS)
+    return _encode(img, fmt, quality)
+
+def save_renditions(
+    storage: StorageBackend, main: bytes, derivatives: Dict[str, Dict[int, bytes]], upload_digest: Optional[str] = None
+) -> Tuple[str, Dict[str, Dict[str, str]]]:
+    """
+    Store the output of `render_derivatives`.
+    Returns the key of the full-size JPEG and the {format: {width: key}} map kept on ProductImage.derivatives.
+    Without `upload_digest` every file is content-addressed (and may be shared by unrelated rows).
+    With it, files are named after the upload under uploads/ and belong to that upload's MediaBlob
+    alone, so they can be deleted once the blob's last reference is gone.
+    """
+    if upload_digest is None:
+        main_key = storage.save_content(main, extension="jpg")
+        keys = {
+            fmt: {str(width): storage.save_content(content, extension=IMAGE_FORMATS[fmt][1]) for width, content in by_width.items()}
+            for fmt, by_width in derivatives.items()
+        }
+        return main_key, keys
+    main_key = storage.save(main, key=digest_key(upload_digest, extension="jpg", prefix="uploads"))
+    keys = {
+        fmt: {
+            str(width): storage.save(
+                content, key=digest_key(upload_digest, extension=IMAGE_FORMATS[fmt][1], prefix="uploads", suffix=f"-{width}w")
+            )
+            for width, content in by_width.items()
+        }
+        for fmt, by_width in derivatives.items()
+    }
+    return main_key, keys
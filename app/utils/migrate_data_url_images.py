@@ -0,0 +1,151 @@
+"""
+Move product images stored inline as base64 `data:` URLs (old upload path) into the media storage.
+
+    python -m app.utils.migrate_data_url_images [--batch-size 50] [--workers 4] [--checkpoint FILE] [--reset]
+
+Rows are paged by id; each batch is decoded, re-encoded (full-size JPEG + derivatives + placeholder,
+like new uploads) on a process pool, written to the storage, and the rows' url/storage_key/derivatives/
+placeholder are rewritten in one short transaction. The last processed id is checkpointed after every batch,
+so the command can be stopped and rerun at any time; it runs alongside the API
+(API workers pick up the new URLs once their product detail cache entries expire).
+Rows whose data cannot be decoded as an image are left untouched and reported.
+"""
+import argparse
+import base64
+import binascii
+import json
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import update
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.product_image import ProductImage
+from app.utils.images import render_derivatives, save_renditions
+from app.utils.storage import get_storage
+
+DEFAULT_CHECKPOINT = "migrate_data_url_images.checkpoint.json"
+
+
+def decode_data_url(data_url: str) -> bytes:
+    """The payload of a base64 `data:` URL. Raises ValueError if it is not one."""
+    header, sep, payload = data_url.partition(",")
+    if not sep or not header.startswith("data:") or not header.endswith(";base64"):
+        raise ValueError("Not a base64 data URL")
+    try:
+        return base64.b64decode(payload, validate=True)
+    except binascii.Error as e:
+        raise ValueError(f"Invalid base64 payload: {e}")
+
+
+def migrate_one(image_id: int, data_url: str) -> Tuple[int, Optional[Dict[str, Any]], Optional[str]]:
+    """
+    Worker job: decode, re-encode and store one image.
+    Returns (image_id, new column values, None) or (image_id, None, error).
+    """
+    try:
+        main, derivatives, placeholder = render_derivatives(
+            decode_data_url(data_url), settings.image_derivative_widths, settings.image_derivative_formats,
+            settings.IMAGE_QUALITY, settings.IMAGE_MAX_DIMENSION, settings.IMAGE_PLACEHOLDER_SIZE
+        )
+    except ValueError as e:
+        return image_id, None, str(e)
+    storage = get_storage()
+    storage_key, derivative_keys = save_renditions(storage, main, derivatives)
+    return image_id, {
+        "url": storage.url(storage_key), "storage_key": storage_key, "derivatives": derivative_keys, "placeholder": placeholder
+    }, None
+
+
+def load_checkpoint(path: str) -> Dict[str, Any]:
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {"last_id": 0, "migrated": 0, "failed": []}
+
+def save_checkpoint(path: str, checkpoint: Dict[str, Any]) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+def fetch_batch(last_id: int, batch_size: int) -> List[Tuple[int, str]]:
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(ProductImage.id, ProductImage.url)
+            .filter(ProductImage.id > last_id, ProductImage.url.like("data:%"))
+            .order_by(ProductImage.id)
+            .limit(batch_size)
+            .all()
+        )
+        return [(row.id, row.url) for row in rows]
+    finally:
+        db.close()
+
+def apply_batch(results: List[Dict[str, Any]]) -> None:
+    """Rewrite the migrated rows in one transaction (only rows that still hold a data URL)."""
+    db = SessionLocal()
+    try:
+        for values in results:
+            db.execute(
+                update(ProductImage)
+                .where(ProductImage.id == values["id"], ProductImage.url.like("data:%"))
+                .values(
+                    url=values["url"], storage_key=values["storage_key"], derivatives=values["derivatives"],
+                    placeholder=values["placeholder"]
+                )
+            )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def run(batch_size: int, workers: int, checkpoint_path: str) -> Dict[str, Any]:
+    checkpoint = load_checkpoint(checkpoint_path)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        while True:
+            batch = fetch_batch(checkpoint["last_id"], batch_size)
+            if not batch:
+                break
+            results = []
+            for image_id, values, error in pool.map(migrate_one, *zip(*batch)):
+                if values is None:
+                    checkpoint["failed"].append({"id": image_id, "error": error})
+                else:
+                    results.append({"id": image_id, **values})
+            apply_batch(results)
+            checkpoint["last_id"] = batch[-1][0]
+            checkpoint["migrated"] += len(results)
+            save_checkpoint(checkpoint_path, checkpoint)
+            print(f"Migrated up to id {checkpoint['last_id']}: {checkpoint['migrated']} done, {len(checkpoint['failed'])} failed")
+    return checkpoint
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Move data-URL product images into the media storage.")
+    parser.add_argument("--batch-size", type=int, default=50, help="Rows per transaction (default: 50)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Parallel image workers")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT, help=f"Progress file (default: {DEFAULT_CHECKPOINT})")
+    parser.add_argument("--reset", action="store_true", help="Ignore an existing checkpoint and start from the first row")
+    args = parser.parse_args(argv)
+
+    if args.reset and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+    checkpoint = run(args.batch_size, args.workers, args.checkpoint)
+    print(f"Done: {checkpoint['migrated']} images migrated, {len(checkpoint['failed'])} failed")
+    for failure in checkpoint["failed"]:
+        print(f"  image {failure['id']}: {failure['error']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,53 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, List
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    return value
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and "dt" in value:
+        if not isinstance(value["dt"], str):
+            raise ValueError("Malformed cursor")
+        return datetime.fromisoformat(value["dt"])
+    if value is not None and not isinstance(value, (str, int, float, bool)):
+        raise ValueError("Malformed cursor") # Only scalars are bound into the seek predicate
+    return value
+
+
+def encode_cursor(sort: str, values: List[Any]) -> str:
+    """
+    Build an opaque keyset-pagination cursor.
+    `sort` names the ordering the cursor belongs to, `values` are the sort key values
+    of the last row of the page (the id tie-breaker included).
+    """
+    payload = {"s": sort, "v": [_encode_value(v) for v in values]}
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str, sort: str) -> List[Any]:
+    """
+    Decode a cursor produced by `encode_cursor`.
+    Raises ValueError if the cursor is malformed (any value other than a scalar or datetime)
+    or was issued for a different ordering.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Malformed cursor")
+    if not isinstance(payload, dict) or not isinstance(payload.get("v"), list):
+        raise ValueError("Malformed cursor")
+    if payload.get("s") != sort:
+        raise ValueError("Cursor does not match the requested sort order")
+    return [_decode_value(v) for v in payload["v"]]
+
+
+# Example usage:
+# cursor = encode_cursor("-id", [1042])
+# decode_cursor(cursor, "-id")  # -> [1042]
@@ -0,0 +1,140 @@
+import math
+import re
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.utils import fold_text
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Every search index registers itself here by name, so its counters can be exposed for monitoring
+indexes: Dict[str, "SearchIndex"] = {}
+
+
+def tokenize(text: str) -> List[str]:
+    """Accent-insensitive word tokens ("Camiseta Básica-XL" -> ["camiseta", "basica", "xl"])."""
+    return TOKEN_RE.findall(fold_text(text)) if text else []
+
+
+class _IndexData:
+    """The postings of a SearchIndex; a rebuild fills a new one and swaps it in."""
+    def __init__(self):
+        self.postings: Dict[str, Dict[Any, float]] = {} # term -> {doc_id: weighted tf}
+        self.doc_terms: Dict[Any, Dict[str, float]] = {} # doc_id -> {term: weighted tf}, to remove/replace it
+        self.doc_length: Dict[Any, float] = {}
+        self.total_length = 0.0
+        self.attributes: Dict[Any, Dict[str, Any]] = {}
+
+    def remove(self, doc_id: Any) -> None:
+        terms = self.doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self.postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self.postings[term]
+        self.total_length -= self.doc_length.pop(doc_id)
+        self.attributes.pop(doc_id, None)
+
+    def add(self, doc_id: Any, terms: Dict[str, float], attributes: Dict[str, Any]) -> None:
+        self.remove(doc_id)
+        self.doc_terms[doc_id] = terms
+        for term, tf in terms.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+        self.doc_length[doc_id] = sum(terms.values())
+        self.total_length += self.doc_length[doc_id]
+        self.attributes[doc_id] = attributes
+
+
+class SearchIndex:
+    """
+    In-memory inverted index ranked with BM25. Documents are dicts of field values
+    (strings or lists of strings); a term's frequency is summed over the fields, each
+    occurrence counting the field's weight, so a match in a name outranks one in a description.
+    Each document also keeps `attributes` (small values to filter results on without a DB query).
+    Readers and writers are serialized by a lock; a rebuild is assembled outside it and swapped in.
+    Registered in `indexes` for its counters.
+    """
+    def __init__(self, name: str, weights: Dict[str, float], k1: float = 1.2, b: float = 0.75):
+        self.name = name
+        self.weights = weights
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._data = _IndexData()
+        self.built_at: Optional[float] = None # time.monotonic() of the last full build
+        self.searches = 0
+        self.builds = 0
+        indexes[name] = self
+
+    def _terms(self, fields: Dict[str, Any]) -> Dict[str, float]:
+        terms: Counter = Counter()
+        for field, weight in self.weights.items():
+            value = fields.get(field)
+            texts = value if isinstance(value, (list, tuple)) else [value]
+            for text in texts:
+                if isinstance(text, str):
+                    for token in tokenize(text):
+                        terms[token] += weight
+        return dict(terms)
+
+    def add(self, doc_id: Any, fields: Dict[str, Any], attributes: Optional[Dict[str, Any]] = None) -> None:
+        """Index a document, replacing any previous version of it."""
+        terms = self._terms(fields)
+        with self._lock:
+            self._data.add(doc_id, terms, attributes or {})
+
+    def remove(self, doc_id: Any) -> None:
+        with self._lock:
+            self._data.remove(doc_id)
+
+    def rebuild(self, documents: Iterable[Tuple[Any, Dict[str, Any], Dict[str, Any]]]) -> None:
+        """Replace the whole index with (doc_id, fields, attributes) documents."""
+        data = _IndexData()
+        for doc_id, fields, attributes in documents:
+            data.add(doc_id, self._terms(fields), attributes)
+        with self._lock:
+            self._data = data
+            self.built_at = time.monotonic()
+            self.builds += 1
+
+    def search(
+        self, query: str, accept: Optional[Callable[[Dict[str, Any]], bool]] = None
+    ) -> List[Tuple[Any, float]]:
+        """
+        (doc_id, score) of the documents containing any query term, best first (ties by doc_id).
+        `accept(attributes)` filters the candidates before they are ranked.
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            self.searches += 1
+            data = self._data
+            count = len(data.doc_terms)
+            if not terms or not count:
+                return []
+            average_length = data.total_length / count or 1.0
+            scores: Dict[Any, float] = {}
+            for term in terms:
+                postings = data.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * data.doc_length[doc_id] / average_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+            if accept is not None:
+                scores = {doc_id: score for doc_id, score in scores.items() if accept(data.attributes[doc_id])}
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": len(self._data.doc_terms),
+                "terms": len(self._data.postings),
+                "searches": self.searches,
+                "builds": self.builds,
+                "age_seconds": round(time.monotonic() - self.built_at, 1) if self.built_at is not None else None,
+            }
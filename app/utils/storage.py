@@ -0,0 +1,128 @@
+import hashlib
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from app.core.config import settings
+
+
+class StorageBackend(ABC):
+    """
+    Where uploaded media lives. Files are addressed by a storage key (a relative path such as
+    "images/3f/a9/3fa9...c2.jpg"); `url()` maps a key to the URL clients load it from.
+    """
+    @abstractmethod
+    def save(self, data: bytes, *, key: str) -> str:
+        """Store `data` under `key` (overwriting is never needed for content-addressed keys)."""
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def open(self, key: str) -> bytes:
+        """Raises FileNotFoundError if the key does not exist."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Delete `key`; a missing key is not an error."""
+
+    @abstractmethod
+    def url(self, key: str) -> str:
+        ...
+
+    def local_path(self, key: str) -> Optional[str]:
+        """A filesystem path for `key` if this backend has one (lets workers read files directly)."""
+        return None
+
+    def key_from_url(self, url: str) -> Optional[str]:
+        """The key of a URL produced by `url()`, or None if it does not point into this storage."""
+        prefix = self.url("")
+        if url and url.startswith(prefix):
+            return url[len(prefix):]
+        return None
+
+    def save_content(self, data: bytes, *, extension: str, prefix: str = "images") -> str:
+        """
+        Store `data` under a content-hash key and return the key.
+        Identical content always gets the same key, so it is stored once.
+        """
+        key = content_key(data, extension=extension, prefix=prefix)
+        if not self.exists(key):
+            self.save(data, key=key)
+        return key
+
+
+def content_key(data: bytes, *, extension: str, prefix: str = "images") -> str:
+    return digest_key(hashlib.sha256(data).hexdigest(), extension=extension, prefix=prefix)
+
+def digest_key(digest: str, *, extension: str, prefix: str = "images", suffix: str = "") -> str:
+    # Two levels of fan-out keep directories small: images/3f/a9/3fa9...c2.jpg
+    return f"{prefix}/{digest[:2]}/{digest[2:4]}/{digest}{suffix}.{extension.lstrip('.')}"
+
+
+class LocalStorage(StorageBackend):
+    """Files under `root` on the local filesystem, served by the /media StaticFiles mount."""
+    def __init__(self, root: str, base_url: str):
+        self.root = os.path.abspath(root)
+        self.base_url = base_url.rstrip("/")
+
+    def path(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, key))
+        if os.path.commonpath([path, self.root]) != self.root:
+            raise ValueError(f"Invalid storage key: {key}")
+        return path
+
+    def local_path(self, key: str) -> Optional[str]:
+        return self.path(key)
+
+    def save(self, data: bytes, *, key: str) -> str:
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temp file in the same directory and rename, so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return key
+
+    def exists(self, key: str) -> bool:
+        return os.path.isfile(self.path(key))
+
+    def open(self, key: str) -> bytes:
+        with open(self.path(key), "rb") as f:
+            return f.read()
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def url(self, key: str) -> str:
+        return f"{self.base_url}/{key}"
+
+
+_storage: Optional[StorageBackend] = None
+
+def get_storage() -> StorageBackend:
+    """The configured storage backend (STORAGE_BACKEND), created on first use."""
+    global _storage
+    if _storage is None:
+        if settings.STORAGE_BACKEND == "local":
+            _storage = LocalStorage(settings.MEDIA_ROOT, settings.MEDIA_URL)
+        else:
+            raise RuntimeError(f"Unknown STORAGE_BACKEND: {settings.STORAGE_BACKEND}")
+    return _storage
+
+
+# Example usage:
+# storage = get_storage()
+# key = storage.save_content(jpeg_bytes, extension="jpg")  # -> "images/3f/a9/3fa9...c2.jpg"
+# storage.url(key)                                        # -> "/media/images/3f/a9/3fa9...c2.jpg"
@@ -7,8 +7,10 @@ CREATE TABLE users (
     role NVARCHAR(50) DEFAULT 'Usuario',
     status NVARCHAR(8) DEFAULT 'active', -- Enum: 'active', 'inactive'
     created_at DATETIME DEFAULT GETDATE(),
-    avatar NVARCHAR(255) NULL
+    avatar NVARCHAR(255) NULL,
+    token_version INT NOT NULL DEFAULT 0
 );
+-- Existing databases: ALTER TABLE users ADD token_version INT NOT NULL DEFAULT 0;
 
 INSERT INTO users (name, email, hashed_password, role, status)
 VALUES ('Juan Pérez', 'juan@email.com', 'hashedpass', 'Administrador', 'active');
@@ -42,6 +44,7 @@ CREATE TABLE products (
     base_price FLOAT NOT NULL,
     sale_price FLOAT NULL,
     cost_price FLOAT NULL,
+    effective_price AS COALESCE(sale_price, base_price) PERSISTED, -- price filters and sorting
     stock INT DEFAULT 0,
     reserved_stock INT DEFAULT 0,
     low_stock_threshold INT DEFAULT 0,
@@ -55,8 +58,8 @@ CREATE TABLE products (
     status NVARCHAR(8) NOT NULL DEFAULT 'draft', -- Enum: 'active', 'inactive', 'draft'
     visibility NVARCHAR(8) NOT NULL DEFAULT 'private', -- Enum: 'public', 'private', 'catalog'
     featured BIT DEFAULT 0,
-    created_at DATETIME DEFAULT GETDATE(),
-    updated_at DATETIME DEFAULT GETDATE(),
+    created_at DATETIME NOT NULL DEFAULT GETDATE(),
+    updated_at DATETIME NOT NULL DEFAULT GETDATE(),
     created_by_user_id INT NULL,
     last_modified_by_user_id INT NULL,
     discounts NVARCHAR(MAX) NULL,
@@ -66,20 +69,55 @@ CREATE TABLE products (
     CONSTRAINT FK_products_modified_by FOREIGN KEY (last_modified_by_user_id) REFERENCES users(id)
 );
 
+CREATE INDEX IX_products_category_status_price ON products (category_id, status, effective_price);
+CREATE INDEX IX_products_category_status_name ON products (category_id, status, name);
+CREATE INDEX IX_products_category_status_created ON products (category_id, status, created_at);
+CREATE INDEX IX_products_category_status_updated ON products (category_id, status, updated_at);
+-- Existing databases: ALTER TABLE products ADD effective_price AS COALESCE(sale_price, base_price) PERSISTED;
+-- (MySQL: ALTER TABLE products ADD effective_price DOUBLE AS (COALESCE(sale_price, base_price)) STORED;)
+-- Existing databases, before creating the created/updated indexes (or after dropping them):
+-- UPDATE products SET created_at = COALESCE(created_at, updated_at, GETDATE()), updated_at = COALESCE(updated_at, created_at, GETDATE())
+--     WHERE created_at IS NULL OR updated_at IS NULL;
+-- ALTER TABLE products ALTER COLUMN created_at DATETIME NOT NULL; ALTER TABLE products ALTER COLUMN updated_at DATETIME NOT NULL;
+-- (MySQL: the same UPDATE with NOW(), then ALTER TABLE products MODIFY created_at DATETIME NOT NULL, MODIFY updated_at DATETIME NOT NULL;)
+
 INSERT INTO products (name, sku, category_id, base_price, slug)
 VALUES ('Laptop', 'SKU123', 1, 15000, 'laptop');
 
 
+-- Tabla: media_blobs (uploaded images shared by product_images, reference counted)
+CREATE TABLE media_blobs (
+    id INT IDENTITY(1,1) PRIMARY KEY,
+    content_hash NVARCHAR(64) NOT NULL UNIQUE,
+    storage_key NVARCHAR(255) NOT NULL,
+    derivatives NVARCHAR(MAX) NULL, -- JSON {format: {width: storage_key}}
+    placeholder NVARCHAR(1024) NULL, -- data URL of a tiny preview
+    ref_count INT NOT NULL DEFAULT 1,
+    created_at DATETIME DEFAULT GETDATE()
+);
+
+
 -- Tabla: product_images
 CREATE TABLE product_images (
     id INT IDENTITY(1,1) PRIMARY KEY,
     url NVARCHAR(2048) NOT NULL,
+    storage_key NVARCHAR(255) NULL,
+    derivatives NVARCHAR(MAX) NULL, -- JSON {format: {width: storage_key}}
+    placeholder NVARCHAR(1024) NULL, -- data URL of a tiny preview
+    blob_id INT NULL, -- media_blobs.id
     alt NVARCHAR(255) NULL,
     display_order INT DEFAULT 0,
     is_main BIT DEFAULT 0,
     product_id INT NOT NULL,
-    CONSTRAINT FK_product_images_product FOREIGN KEY (product_id) REFERENCES products(id)
+    CONSTRAINT FK_product_images_product FOREIGN KEY (product_id) REFERENCES products(id),
+    CONSTRAINT FK_product_images_blob FOREIGN KEY (blob_id) REFERENCES media_blobs(id)
 );
+CREATE INDEX IX_product_images_blob_id ON product_images (blob_id);
+-- Existing databases: ALTER TABLE product_images ADD storage_key NVARCHAR(255) NULL;
+-- Existing databases: ALTER TABLE product_images ADD derivatives NVARCHAR(MAX) NULL;
+-- Existing databases: ALTER TABLE product_images ADD blob_id INT NULL;
+-- Existing databases: ALTER TABLE product_images ADD placeholder NVARCHAR(1024) NULL;
+-- Existing databases: ALTER TABLE media_blobs ADD placeholder NVARCHAR(1024) NULL;
 
 INSERT INTO product_images (url, product_id)
 VALUES ('https://ejemplo.com/imagen.jpg', 1);
@@ -3,6 +3,7 @@ from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
 from httpx import Response # For type hinting response
 
+from app.core import security
 from app.core.config import settings
 from app import schemas # Import top-level schemas
 from app.services import user_service # Import user_service instance
@@ -133,6 +134,40 @@ def test_refresh_token_invalid(client: TestClient):
     assert response.status_code == 401
     assert response.json()["detail"] == "Invalid refresh token"
 
+def test_principal_claims_are_revoked_by_password_change(client: TestClient, test_user_data: dict, monkeypatch):
+    monkeypatch.setattr(settings, "JWT_PRINCIPAL_CLAIMS", True)
+    login_resp: Response = client.post(
+        f"{settings.API_V1_STR}/auth/login/access-token",
+        data={"username": test_user_data["email"], "password": test_user_data["password"]},
+    )
+    tokens = login_resp.json()
+    token_data = security.decode_token(tokens["access_token"])
+    assert token_data.ver is not None
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+
+    change_resp: Response = client.post(
+        f"{settings.API_V1_STR}/auth/change-password", params={"new_password": "a-new-password"}, headers=headers
+    )
+    assert change_resp.status_code == 200
+
+    assert client.get(f"{settings.API_V1_STR}/auth/me", headers=headers).status_code == 401
+    refresh_resp: Response = client.post(
+        f"{settings.API_V1_STR}/auth/token/refresh", json={"refresh_token": tokens["refresh_token"]}
+    )
+    assert refresh_resp.status_code == 401
+
+def test_decoded_tokens_are_cached_until_exp():
+    from datetime import timedelta
+    token = security.create_access_token(subject="cached@example.com")
+    first = security.decode_token(token)
+    hits = security.token_cache.hits
+    assert security.decode_token(token) is first
+    assert security.token_cache.hits == hits + 1
+
+    expired = security.create_access_token(subject="cached@example.com", expires_delta=timedelta(seconds=-1))
+    assert security.decode_token(expired) is None
+    assert security.token_cache.stats()["hit_ratio"] is not None
+
 # TODO: Add test for inactive user trying to login (if status check is strictly enforced at login)
 # TODO: Add test for inactive user trying to refresh token (if status check is strictly enforced at refresh)
 # TODO: Test token expiry if possible (might require mocking time or short-lived tokens in test settings)
@@ -102,6 +102,24 @@ def test_read_categories_paginated(client: TestClient, db: Session, faker_instan
         assert cat["parent_id"] is None
 
 
+def test_read_category_tree_with_depth(client: TestClient, db: Session, faker_instance):
+    root_id = client.post(f"{settings.API_V1_STR}/categories/", json=get_category_create_data(faker_instance, name="Depth Root")).json()["id"]
+    child_id = client.post(f"{settings.API_V1_STR}/categories/", json=get_category_create_data(faker_instance, name="Depth Child", parent_id=root_id)).json()["id"]
+    client.post(f"{settings.API_V1_STR}/categories/", json=get_category_create_data(faker_instance, name="Depth Grandchild", parent_id=child_id))
+
+    full = client.get(f"{settings.API_V1_STR}/categories/{root_id}").json()
+    assert full["subcategories"][0]["id"] == child_id
+    assert full["subcategories"][0]["subcategories"][0]["name"] == "Depth Grandchild"
+
+    limited = client.get(f"{settings.API_V1_STR}/categories/{root_id}?depth=1").json()
+    assert limited["subcategories"][0]["id"] == child_id
+    assert limited["subcategories"][0]["subcategories"] == []
+
+    top_level = client.get(f"{settings.API_V1_STR}/categories/?topLevel=true&depth=0").json()
+    root = next(cat for cat in top_level if cat["id"] == root_id)
+    assert root["subcategories"] == []
+
+
 def test_read_single_category_by_id(client: TestClient, db: Session, faker_instance):
     category_data = get_category_create_data(faker_instance)
     create_response = client.post(f"{settings.API_V1_STR}/categories/", json=category_data)
@@ -0,0 +1,27 @@
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from httpx import Response
+
+from app.core.config import settings
+from app.core.security import create_access_token
+from app.schemas.user import UserCreate
+from app.services import user_service
+
+
+def test_monitoring_requires_a_superuser(client: TestClient, db: Session, auth_headers: dict, faker_instance):
+    for path in ("/monitoring/caches", "/monitoring/executors", "/monitoring/search-indexes"):
+        anonymous: Response = client.get(f"{settings.API_V1_STR}{path}")
+        assert anonymous.status_code == 401
+        regular: Response = client.get(f"{settings.API_V1_STR}{path}", headers=auth_headers)
+        assert regular.status_code == 403
+
+    admin = user_service.create(db, obj_in=UserCreate(
+        email=faker_instance.email(), password=faker_instance.password(), name="Admin", role="Administrador"
+    ))
+    admin_headers = {"Authorization": f"Bearer {create_access_token(subject=admin.email)}"}
+    response: Response = client.get(f"{settings.API_V1_STR}/monitoring/caches", headers=admin_headers)
+    assert response.status_code == 200
+    assert "product_detail" in response.json()
+    assert "product_search" not in response.json() # Listed under /monitoring/search-indexes
+    indexes_response: Response = client.get(f"{settings.API_V1_STR}/monitoring/search-indexes", headers=admin_headers)
+    assert "product_search" in indexes_response.json()
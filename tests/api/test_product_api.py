@@ -8,6 +8,7 @@ from app.core.config import settings
 from app import schemas
 from app.services import product_service, category_service
 from app.models import Product, Category, User # Import models
+from app.utils.pagination import encode_cursor
 
 # --- Helper to create a category for product tests ---
 @pytest.fixture(scope="function") # function scope if each test needs a clean category
@@ -119,6 +120,77 @@ def test_read_products_paginated(client: TestClient, db: Session, test_category:
     assert len(data_page2["items"]) >= 2 # Remaining items
 
 
+def test_read_products_cursor_pagination(client: TestClient, db: Session, test_category: Category, auth_headers: dict, faker_instance):
+    for i in range(5):
+        client.post(
+            f"{settings.API_V1_STR}/products/",
+            json=get_product_create_data(test_category.id, faker_instance, name=f"Cursor Product {i}", sku=f"SKU-CURSOR-{i}", slug=f"cursor-product-{i}"),
+            headers=auth_headers
+        )
+
+    seen_ids = []
+    cursor = ""
+    while cursor is not None:
+        response: Response = client.get(
+            f"{settings.API_V1_STR}/products/",
+            params={"category_id": test_category.id, "page_limit": 2, "cursor": cursor}
+        )
+        assert response.status_code == 200, response.text
+        data = response.json()
+        assert data["page"] is None
+        assert len(data["items"]) <= 2
+        seen_ids.extend(item["id"] for item in data["items"])
+        cursor = data["next_cursor"]
+
+    assert len(seen_ids) == 5
+    assert seen_ids == sorted(seen_ids, reverse=True) # id DESC, no duplicates across pages
+
+    # Offset pages hand over a cursor that continues where they stopped
+    offset_page = client.get(f"{settings.API_V1_STR}/products/", params={"category_id": test_category.id, "page_limit": 2}).json()
+    next_page = client.get(
+        f"{settings.API_V1_STR}/products/",
+        params={"category_id": test_category.id, "page_limit": 2, "cursor": offset_page["next_cursor"]}
+    ).json()
+    assert [item["id"] for item in next_page["items"]] == seen_ids[2:4]
+
+    invalid: Response = client.get(f"{settings.API_V1_STR}/products/", params={"cursor": "not-a-cursor"})
+    assert invalid.status_code == 400
+    for values in ([1, 2], [[1]]): # Wrong number of sort keys, non-scalar value
+        forged: Response = client.get(f"{settings.API_V1_STR}/products/", params={"cursor": encode_cursor("-id", values)})
+        assert forged.status_code == 400
+
+
+def test_read_products_price_filter_and_sort(client: TestClient, db: Session, test_category: Category, auth_headers: dict, faker_instance):
+    # (base_price, sale_price): effective prices 20, 15, 20, 40
+    for i, (base_price, sale_price) in enumerate([(20.0, None), (30.0, 15.0), (20.0, None), (40.0, None)]):
+        data = get_product_create_data(
+            test_category.id, faker_instance, sku=f"SKU-PRICE-{i}", slug=f"price-product-{i}",
+            base_price=base_price, sale_price=sale_price, images=[], variants=[]
+        )
+        client.post(f"{settings.API_V1_STR}/products/", json=data, headers=auth_headers)
+
+    params = {"category_id": test_category.id, "sort": "price", "page_limit": 1}
+    seen = []
+    cursor = ""
+    while cursor is not None:
+        response: Response = client.get(f"{settings.API_V1_STR}/products/", params={**params, "cursor": cursor})
+        assert response.status_code == 200, response.text
+        data = response.json()
+        seen.extend(item["sale_price"] or item["base_price"] for item in data["items"])
+        cursor = data["next_cursor"]
+    assert seen == [15.0, 20.0, 20.0, 40.0] # Ties on price are paged by id, none skipped or repeated
+
+    response = client.get(
+        f"{settings.API_V1_STR}/products/",
+        params={"category_id": test_category.id, "price_min": 15, "price_max": 20, "sort": "-price"}
+    )
+    assert [item["sale_price"] or item["base_price"] for item in response.json()["items"]] == [20.0, 20.0, 15.0]
+
+    price_cursor = client.get(f"{settings.API_V1_STR}/products/", params=params).json()["next_cursor"]
+    mismatched = client.get(f"{settings.API_V1_STR}/products/", params={"sort": "name", "cursor": price_cursor})
+    assert mismatched.status_code == 400
+
+
 def test_read_single_product_by_id(client: TestClient, db: Session, test_category: Category, auth_headers: dict, faker_instance):
     product_data = get_product_create_data(test_category.id, faker_instance)
     create_response = client.post(f"{settings.API_V1_STR}/products/", json=product_data, headers=auth_headers)
@@ -178,6 +250,21 @@ def test_update_product(client: TestClient, db: Session, test_category: Category
     assert product_db.name == "Updated Product Name"
 
 
+def test_update_product_invalidates_cached_detail(client: TestClient, db: Session, test_category: Category, auth_headers: dict, faker_instance):
+    product_data = get_product_create_data(test_category.id, faker_instance)
+    product_id = client.post(f"{settings.API_V1_STR}/products/", json=product_data, headers=auth_headers).json()["id"]
+
+    # First read fills the cache, the second one is served from it
+    assert client.get(f"{settings.API_V1_STR}/products/{product_id}").json()["name"] == product_data["name"]
+    assert client.get(f"{settings.API_V1_STR}/products/{product_id}").json()["name"] == product_data["name"]
+
+    client.put(f"{settings.API_V1_STR}/products/{product_id}", json={"name": "Renamed Cached Product"}, headers=auth_headers)
+    response: Response = client.get(f"{settings.API_V1_STR}/products/{product_id}")
+    assert response.json()["name"] == "Renamed Cached Product"
+    assert client.get(f"{settings.API_V1_STR}/products/renamed-cached-product").json()["id"] == product_id
+    assert client.get(f"{settings.API_V1_STR}/products/{product_data['slug']}").status_code == 404 # Old slug
+
+
 def test_delete_product(client: TestClient, db: Session, test_category: Category, auth_headers: dict, faker_instance):
     product_data = get_product_create_data(test_category.id, faker_instance)
     create_response = client.post(f"{settings.API_V1_STR}/products/", json=product_data, headers=auth_headers)
@@ -237,6 +324,81 @@ def test_delete_product_image(client: TestClient, db: Session, test_category: Ca
     product_db_after_delete = product_service.get(db, id=product_id)
     assert len(product_db_after_delete.images) == 0
 
+def test_batch_upload_product_images(client: TestClient, db: Session, test_category: Category, auth_headers: dict, faker_instance):
+    import io, json
+    from PIL import Image
+
+    product_data = get_product_create_data(test_category.id, faker_instance, images=[])
+    product_id = client.post(f"{settings.API_V1_STR}/products/", json=product_data, headers=auth_headers).json()["id"]
+    buffer = io.BytesIO()
+    Image.new("RGB", (400, 300), (10, 120, 200)).save(buffer, "PNG")
+    png = buffer.getvalue()
+
+    response: Response = client.post(
+        f"{settings.API_V1_STR}/products/{product_id}/images/batch",
+        files=[
+            ("images", ("front.png", png, "image/png")),
+            ("images", ("copy.png", png, "image/png")),
+            ("images", ("notes.txt", b"not an image", "text/plain")),
+        ],
+        data={"metadata": json.dumps([{"alt": "Front", "is_main": True}])},
+        headers=auth_headers
+    )
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert (data["created"], data["failed"]) == (2, 1)
+    assert [result["status"] for result in data["results"]] == ["created", "created", "failed"]
+    assert data["results"][0]["image"]["alt"] == "Front"
+    assert data["results"][1]["image"]["display_order"] == 1
+    assert data["results"][0]["image"]["url"] == data["results"][1]["image"]["url"] # Identical files share storage
+
+    product_db = product_service.get(db, id=product_id)
+    assert len(product_db.images) == 2
+
+def test_search_products(client: TestClient, db: Session, test_category: Category, auth_headers: dict, faker_instance):
+    first = get_product_create_data(test_category.id, faker_instance, name="Lámpara Zafiro", images=[], variants=[])
+    second = get_product_create_data(test_category.id, faker_instance, images=[], variants=[])
+    second["description"] = "Pantalla de vidrio para la lampara zafiro"
+    first_id = client.post(f"{settings.API_V1_STR}/products/", json=first, headers=auth_headers).json()["id"]
+    second_id = client.post(f"{settings.API_V1_STR}/products/", json=second, headers=auth_headers).json()["id"]
+
+    response = client.get(f"{settings.API_V1_STR}/products/search", params={"q": "ZAFIRO lampara"})
+    assert response.status_code == 200, response.text
+    ids = [item["id"] for item in response.json()["items"]]
+    assert ids.index(first_id) < ids.index(second_id) # Name matches rank above description matches
+
+    client.put(f"{settings.API_V1_STR}/products/{first_id}", json={"name": "Lámpara Rubí"}, headers=auth_headers)
+    response = client.get(f"{settings.API_V1_STR}/products/search", params={"q": "rubi"})
+    assert [item["id"] for item in response.json()["items"]] == [first_id]
+
+
+def test_read_products_with_facets(client: TestClient, db: Session, test_category: Category, auth_headers: dict, faker_instance):
+    subcategory = category_service.create(db, obj_in=schemas.CategoryCreate(
+        name="Facet Subcategory", slug=faker_instance.slug(), parent_id=test_category.id
+    ))
+    leaf = category_service.create(db, obj_in=schemas.CategoryCreate(
+        name="Facet Leaf", slug=faker_instance.slug(), parent_id=subcategory.id
+    ))
+    for category_id, status_value in ((test_category.id, "active"), (test_category.id, "active"), (test_category.id, "draft"), (leaf.id, "active")):
+        data = get_product_create_data(category_id, faker_instance, images=[], variants=[], status=status_value)
+        client.post(f"{settings.API_V1_STR}/products/", json=data, headers=auth_headers)
+
+    params = {"category_id": test_category.id, "facets": "status,category_id"}
+    response = client.get(f"{settings.API_V1_STR}/products/", params=params)
+    assert response.status_code == 200, response.text
+    facets = response.json()["facets"]
+    assert [(facet["value"], facet["count"]) for facet in facets["status"]] == [("active", 2), ("draft", 1)]
+    assert [(facet["value"], facet["count"]) for facet in facets["category_id"]] == [(test_category.id, 3)]
+    response = client.get(f"{settings.API_V1_STR}/products/", params={"category_id": leaf.id, "facets": "category_id,status"})
+    assert response.json()["total"] == 1
+    assert [(facet["value"], facet["count"]) for facet in response.json()["facets"]["category_id"]] == [(leaf.id, 1)]
+    assert [(facet["value"], facet["count"]) for facet in response.json()["facets"]["status"]] == [("active", 1)]
+
+    response = client.get(f"{settings.API_V1_STR}/products/", params={"category_id": test_category.id, "facets": "status", "status": "draft"})
+    assert [(facet["value"], facet["count"]) for facet in response.json()["facets"]["status"]] == [("draft", 1)]
+    assert client.get(f"{settings.API_V1_STR}/products/", params={"facets": "color"}).status_code == 400
+    assert client.get(f"{settings.API_V1_STR}/products/").json()["facets"] is None
+
 # TODO: Add tests for product variants sub-resources if endpoints are implemented
 # TODO: Add tests for filtering products (status, featured, category_id)
 # TODO: Test updating product images/variants through the main product update endpoint if that logic is complexly handled there.
@@ -0,0 +1,62 @@
+import pytest
+from sqlalchemy.orm import Session
+
+from app.services.category_service import category_service
+from app.services.product_service import product_service
+from app.schemas.category import CategoryCreate, CategoryUpdate
+from app.schemas.product import ProductCreate
+
+
+def create_category(db: Session, faker_instance, **overrides):
+    data = {
+        "name": f"Tree Category {faker_instance.uuid4()[:6]}",
+        "slug": f"tree-cat-{faker_instance.uuid4()[:8]}",
+    }
+    data.update(overrides)
+    return category_service.create(db, obj_in=CategoryCreate(**data))
+
+
+def test_get_tree_assembles_hierarchy(db: Session, faker_instance):
+    parent = create_category(db, faker_instance)
+    child = create_category(db, faker_instance, parent_id=parent.id)
+    grandchild = create_category(db, faker_instance, parent_id=child.id)
+
+    tree = category_service.get_tree(db)
+    node = tree.get(parent.id)
+    assert node.subcategories[0].id == child.id
+    assert node.subcategories[0].subcategories[0].id == grandchild.id
+    assert tree.get_by_slug(child.slug).id == child.id
+    assert tree.get(parent.id, depth=1).subcategories[0].subcategories == []
+    assert tree.get(999999) is None
+
+
+def test_get_tree_is_cached_until_a_write(db: Session, faker_instance):
+    category = create_category(db, faker_instance)
+
+    tree = category_service.get_tree(db)
+    assert category_service.get_tree(db) is tree # Served from the cache
+    assert category_service.get_cached_tree() is tree
+
+    category_service.update(db, db_obj=category, obj_in=CategoryUpdate(name="Renamed Tree Category"))
+    assert category_service.get_cached_tree() is None # Version bumped by the write
+
+    fresh_tree = category_service.get_tree(db)
+    assert fresh_tree is not tree
+    assert fresh_tree.get(category.id).name == "Renamed Tree Category"
+
+    created = create_category(db, faker_instance)
+    assert category_service.get_tree(db).get(created.id) is not None
+
+
+def test_category_update_discards_product_details_read_before_it(db: Session, faker_instance):
+    category = create_category(db, faker_instance)
+    product = product_service.create(db, obj_in=ProductCreate(
+        name="Cached Detail Product", sku=f"CACHE-{faker_instance.uuid4()[:8]}", category_id=category.id,
+        base_price=10.0, slug=f"cached-detail-{faker_instance.uuid4()[:8]}",
+    ))
+    loaded = product_service.get(db, id=product.id)
+    generation = product_service.detail_generation # Read started before the category write
+
+    category_service.update(db, db_obj=category, obj_in=CategoryUpdate(name="Renamed Detail Category"))
+    product_service.cache_detail(loaded, generation)
+    assert product_service.get_cached_detail(str(product.id)) is None
@@ -1,12 +1,17 @@
 import pytest
+from contextlib import contextmanager
+from unittest import mock
+from sqlalchemy import event, join, select, true
+from sqlalchemy.dialects import mssql
 from sqlalchemy.orm import Session
 from fastapi import HTTPException # For catching expected HTTPExceptions if service raises them
 
+from app import schemas
 from app.services import product_service, category_service, user_service
 from app.schemas.product import ProductCreate, ProductUpdate
 from app.schemas.category import CategoryCreate
 from app.schemas.user import UserCreate # For creating a test user
-from app.models import Product, Category, User, ProductImage, ProductVariant # Import models
+from app.models import Product, Category, User, ProductImage, ProductVariant, MediaBlob # Import models
 from app.utils import generate_slug
 
 @pytest.fixture(scope="function")
@@ -167,6 +172,164 @@ def test_manage_product_images(db: Session, db_test_category: Category, faker_in
     assert len(product.images) == 0
 
 
+def test_identical_uploads_share_one_refcounted_blob(db: Session, db_test_category: Category, faker_instance):
+    product = product_service.create(db, obj_in=get_sample_product_create_schema(db_test_category.id, faker_instance, images=[], variants=[]))
+    content_hash = "ab" * 32
+    assert product_service.add_product_image_from_blob(db, product=product, content_hash=content_hash) is None
+
+    first = product_service.add_product_image(
+        db, product=product, image_in=schemas.ProductImageCreate(url="/media/uploads/a.jpg", is_main=True),
+        storage_key="uploads/a.jpg", content_hash=content_hash
+    )
+    second = product_service.add_product_image_from_blob(db, product=product, content_hash=content_hash, alt="Copy")
+    assert second is not None
+    assert second.blob_id == first.blob_id
+    assert second.storage_key == "uploads/a.jpg"
+    assert first.blob.ref_count == 2
+
+    product_service.remove_product_image(db, image_id=first.id)
+    blob = db.query(MediaBlob).filter(MediaBlob.content_hash == content_hash).one()
+    assert blob.ref_count == 1
+    product_service.remove_product_image(db, image_id=second.id)
+    assert db.query(MediaBlob).filter(MediaBlob.content_hash == content_hash).first() is None
+
+
+def test_purge_blob_keeps_files_registered_again_by_an_upload(db: Session, db_test_category: Category, faker_instance):
+    product = product_service.create(db, obj_in=get_sample_product_create_schema(db_test_category.id, faker_instance, images=[], variants=[]))
+    content_hash = "cd" * 32
+    image_in = schemas.ProductImageCreate(url="/media/uploads/c.jpg", is_main=True)
+    image = product_service.add_product_image(db, product=product, image_in=image_in, storage_key="uploads/c.jpg", content_hash=content_hash)
+
+    # The last image goes: its blob stays, unreferenced, until purged
+    db.delete(image)
+    released = product_service.product_service.release_image_blob(db, blob_id=image.blob_id)
+    db.commit()
+    # The same file is uploaded again first: it locks the blob, stores its files and registers them
+    assert product_service.product_service.lock_upload_blobs(db, content_hashes=[content_hash])[content_hash].ref_count == 0
+    again = product_service.add_product_image(db, product=product, image_in=image_in, storage_key="uploads/c.jpg", content_hash=content_hash)
+
+    with mock.patch.object(product_service.product_service, "delete_blob_files") as delete_blob_files:
+        product_service.product_service.purge_blob(db, blob_id=released.id)
+    delete_blob_files.assert_not_called()
+    assert again.blob_id == released.id
+    assert db.query(MediaBlob).filter(MediaBlob.content_hash == content_hash).one().ref_count == 1
+
+def test_fulltext_search_filter_compiles_to_match_against(db: Session):
+    from sqlalchemy.dialects import mysql
+    query = product_service.product_service.apply_filters(
+        db.query(Product.id), {"search": "+mesa -silla", "search_mode": "boolean", "status": "active"}
+    )
+    sql = str(query.statement.compile(dialect=mysql.dialect()))
+    assert "MATCH (products.name, products.short_description, products.description) AGAINST" in sql
+    assert "IN BOOLEAN MODE" in sql
+    natural = product_service.product_service.fulltext_match("mesa roble")
+    assert "IN NATURAL LANGUAGE MODE" in str(natural.compile(dialect=mysql.dialect()))
+
+
+@contextmanager
+def count_statements(db: Session):
+    statements = []
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    bind = db.get_bind()
+    event.listen(bind, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(bind, "before_cursor_execute", before_cursor_execute)
+
+
+def test_get_multi_paginated_statement_count_is_independent_of_page_size(db: Session, db_test_category: Category, faker_instance):
+    for i in range(6):
+        product_in = get_sample_product_create_schema(
+            db_test_category.id, faker_instance, sku=f"SVC-NPLUS1-{i}", slug=f"svc-nplus1-{i}", variants=[]
+        )
+        product = product_service.create(db, obj_in=product_in)
+        db.add(ProductVariant(product_id=product.id, name="Color", type="color", value="Blue", sku=f"SVC-NPLUS1-{i}-BLUE", price=10.0))
+    db.commit()
+    filters = {"category_id": db_test_category.id}
+
+    statement_counts = {}
+    for limit in (2, 6):
+        db.expire_all()
+        with count_statements(db) as statements:
+            items, total = product_service.get_multi_paginated(db, skip=0, limit=limit, filters=filters)
+            # Serializing the page is where lazy loads used to fire, one per product and relationship
+            schemas.ProductPaginated(total=total, items=items, page=1, size=limit)
+        assert len(items) == limit
+        statement_counts[limit] = len(statements)
+
+    assert statement_counts[2] == statement_counts[6]
+
+    db.expire_all()
+    with count_statements(db) as statements:
+        items, total = product_service.get_multi_paginated(db, skip=0, limit=6, filters=filters, with_details=False)
+        schemas.ProductSummaryPaginated(total=total, items=items, page=1, size=6)
+    assert len(statements) < statement_counts[6] # No images/variants queries at all
+
+
+def test_listed_products_serialize_without_lazy_loads(db: Session, db_test_category: Category, faker_instance):
+    # With USE_ASYNC_DB the page is serialized outside the session's greenlet, where a lazy load fails
+    for i in range(2):
+        product = product_service.create(db, obj_in=get_sample_product_create_schema(
+            db_test_category.id, faker_instance, sku=f"SVC-EAGER-{i}", slug=f"svc-eager-{i}", images=[], variants=[]
+        ))
+        db.add(ProductVariant(product_id=product.id, name="Color", type="color", value="Red", sku=f"SVC-EAGER-{i}-RED", price=10.0))
+    db.commit()
+    db.expire_all()
+
+    items, total = product_service.get_multi_paginated(db, skip=0, limit=10, filters={"category_id": db_test_category.id})
+    db.expunge_all() # Any lazy load now raises DetachedInstanceError
+    page = schemas.ProductPaginated(total=total, items=items, page=1, size=10)
+    assert [len(item.variants) for item in page.items] == [1, 1]
+    assert all(item.category.id == db_test_category.id for item in page.items)
+
+def test_get_facets_counts_every_facet_in_one_statement(db: Session, db_test_category: Category, faker_instance):
+    for i, (base_price, sale_price, tags, featured) in enumerate([
+        (10.0, None, ["red", "big"], False), (60.0, 20.0, ["red"], True), (300.0, None, ["big", "red"], False),
+    ]):
+        product_service.create(db, obj_in=get_sample_product_create_schema(
+            db_test_category.id, faker_instance, sku=f"SVC-FACET-{i}", slug=f"svc-facet-{i}", images=[], variants=[],
+            base_price=base_price, sale_price=sale_price, tags=tags, featured=featured, status="active"
+        ))
+
+    subcategory = category_service.create(db, obj_in=CategoryCreate(
+        name="Facet Subcategory", slug=f"svc-facet-sub-{faker_instance.slug()}", parent_id=db_test_category.id
+    ))
+    leaf = category_service.create(db, obj_in=CategoryCreate(
+        name="Facet Leaf", slug=f"svc-facet-leaf-{faker_instance.slug()}", parent_id=subcategory.id
+    ))
+    product_service.create(db, obj_in=get_sample_product_create_schema(
+        leaf.id, faker_instance, sku="SVC-FACET-LEAF", slug="svc-facet-leaf", images=[], variants=[], tags=None, status="active"
+    ))
+
+    filters = {"category_id": db_test_category.id}
+    with count_statements(db) as statements:
+        facets = product_service.get_facets(db, facets=["category_id", "featured", "price", "tags"], filters=filters)
+    assert len(statements) == 1
+    # The products of the filtered category itself, like every other facet
+    assert facets["category_id"] == [{"value": db_test_category.id, "count": 3}]
+    # Unfiltered, each category counts what filtering on it returns
+    by_category = product_service.get_facets(db, facets=["category_id"])["category_id"]
+    assert by_category == [{"value": db_test_category.id, "count": 3}, {"value": leaf.id, "count": 1}]
+    for facet in by_category:
+        _, total = product_service.get_multi_paginated(db, filters={"category_id": facet["value"]}, with_details=False)
+        assert total == facet["count"]
+    assert facets["featured"] == [{"value": False, "count": 2}, {"value": True, "count": 1}]
+    assert facets["tags"] == [{"value": "red", "count": 3}, {"value": "big", "count": 2}]
+    # Bought at the sale price: 20 falls in the first bucket with 10
+    assert [(bucket["min"], bucket["max"], bucket["count"]) for bucket in facets["price"]] == [(0.0, 25.0, 2), (250.0, 500.0, 1)]
+
+
+def test_tag_elements_are_cross_applied_on_sql_server():
+    products = Product.__table__
+    db = mock.Mock()
+    db.get_bind.return_value.dialect.name = "mssql"
+    elements, tag = product_service.product_service.tag_elements(db, products.c.tags)
+    statement = select(tag).select_from(join(products, elements, true()))
+    assert "FROM products CROSS APPLY openjson(json_query(products.tags))" in str(statement.compile(dialect=mssql.dialect()))
+
+
 # TODO: Test get_multi_paginated with various filters
 # TODO: Test for IntegrityError (e.g., duplicate SKU on create, if service pre-checked or if DB raises it)
 # The current service create method doesn't explicitly pre-check SKU uniqueness, relying on DB constraints.
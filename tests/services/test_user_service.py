@@ -1,11 +1,15 @@
+import asyncio
 import pytest
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
 
 from app.services import user_service
+from app.services.user_service import async_user_service
 from app.schemas.user import UserCreate, UserUpdate
 from app.models.user import User
-from app.core.security import verify_password
+from passlib.context import CryptContext
+
+from app.core.security import pwd_context, verify_password
 
 def test_create_user(db: Session, faker_instance):
     email = faker_instance.email()
@@ -100,6 +104,64 @@ def test_update_user(db: Session, faker_instance):
     assert not verify_password(password, user_after_pass_update.hashed_password)
 
 
+def test_async_user_service_wraps_sync_service(db: Session, faker_instance):
+    email = faker_instance.email()
+    user_in = UserCreate(email=email, password=faker_instance.password(), name=faker_instance.name())
+    created_user = asyncio.run(async_user_service.create(db, obj_in=user_in))
+
+    retrieved_user = asyncio.run(async_user_service.get_by_email(db, email=email))
+    assert retrieved_user is not None
+    assert retrieved_user.id == created_user.id
+
+    assert asyncio.run(async_user_service.get(db, id=created_user.id)).email == email
+
+
+def test_principal_cache_is_invalidated_by_update(db: Session, faker_instance):
+    email = faker_instance.email()
+    user_in = UserCreate(email=email, password=faker_instance.password(), name=faker_instance.name())
+    db_user = user_service.create(db, obj_in=user_in)
+    service = async_user_service.crud
+
+    service.cache_principal(db_user, service.principal_generation)
+    cached = service.get_cached_principal(email)
+    assert cached is not None
+    assert cached is not service.get_cached_principal(email) # A fresh instance per request
+    assert cached.id == db_user.id
+    assert cached.status == "active"
+
+    # Updates write the new values (and the bumped token_version) through
+    token_version = db_user.token_version or 0
+    service.update(db, db_obj=db_user, obj_in=UserUpdate(status="inactive"))
+    cached = service.get_cached_principal(email)
+    assert cached.status == "inactive"
+    assert cached.token_version == token_version + 1
+
+    # A user loaded before a write is not cached after it
+    generation = service.principal_generation
+    stale = service.get_cached_principal(email)
+    service.update(db, db_obj=db_user, obj_in=UserUpdate(role="Editor"))
+    service.cache_principal(stale, generation)
+    assert service.get_cached_principal(email).role == "Editor"
+
+
+def test_authenticate_upgrades_outdated_hash(db: Session, faker_instance):
+    email = faker_instance.email()
+    password = faker_instance.password(length=10)
+    db_user = user_service.create(db, obj_in=UserCreate(email=email, password=password, name=faker_instance.name()))
+    # Simulate a hash made with an older, cheaper cost
+    old_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash(password)
+    db_user.hashed_password = old_hash
+    db.commit()
+    assert pwd_context.needs_update(old_hash)
+
+    user = asyncio.run(async_user_service.authenticate(db, email=email, password=password))
+    assert user is not None
+    db.refresh(db_user)
+    assert db_user.hashed_password != old_hash
+    assert not pwd_context.needs_update(db_user.hashed_password)
+    assert verify_password(password, db_user.hashed_password)
+
+
 def test_is_active(faker_instance):
     active_user = User(email=faker_instance.email(), name=faker_instance.name(), hashed_password="dummy", status="active")
     inactive_user = User(email=faker_instance.email(), name=faker_instance.name(), hashed_password="dummy", status="inactive")
@@ -0,0 +1,10 @@
+from app.utils.backfill_image_placeholders import smallest_rendition_key
+
+def test_smallest_rendition_key():
+    derivatives = {
+        "jpeg": {"800": "a-800w.jpg", "96": "a-96w.jpg"},
+        "webp": {"320": "a-320w.webp"},
+    }
+    assert smallest_rendition_key("a.jpg", derivatives) == "a-96w.jpg"
+    assert smallest_rendition_key("a.jpg", None) == "a.jpg"
+    assert smallest_rendition_key("a.jpg", {"webp": {}}) == "a.jpg"
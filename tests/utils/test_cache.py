@@ -0,0 +1,36 @@
+import time
+from app.utils.cache import TTLCache, caches
+
+def test_cache_get_set_and_stats():
+    cache = TTLCache("test_basic", maxsize=10, ttl=60)
+    assert cache.get("missing") is None
+    cache.set("key", "value")
+    assert cache.get("key") == "value"
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_ratio"] == 0.5
+    assert caches["test_basic"] is cache
+
+def test_cache_evicts_least_recently_used():
+    cache = TTLCache("test_lru", maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a") # "b" is now the least recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+def test_cache_entries_expire():
+    cache = TTLCache("test_ttl", maxsize=10, ttl=60)
+    cache.set("short", "value", ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get("short") is None
+    assert cache.stats()["expirations"] == 1
+
+def test_disabled_cache_stores_nothing():
+    cache = TTLCache("test_disabled", maxsize=0, ttl=60)
+    cache.set("key", "value")
+    assert cache.get("key") is None
@@ -0,0 +1,39 @@
+import os
+from app.utils.disk_cache import DiskLRUCache
+
+def test_disk_cache_get_put(tmp_path):
+    cache = DiskLRUCache("test_disk_basic", str(tmp_path), max_bytes=1000)
+    name = DiskLRUCache.filename("key", "webp")
+    assert cache.get(name) is None
+    path = cache.put(name, b"data")
+    assert cache.get(name) == path
+    with open(path, "rb") as f:
+        assert f.read() == b"data"
+    assert cache.stats()["hit_ratio"] == 0.5
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    cache = DiskLRUCache("test_disk_lru", str(tmp_path), max_bytes=10)
+    cache.put("a", b"aaaa")
+    cache.put("b", b"bbbb")
+    cache.get("a") # "b" is now the least recently used
+    cache.put("c", b"cccc")
+    assert cache.get("b") is None
+    assert not os.path.exists(tmp_path / "b")
+    assert cache.get("a") is not None
+    assert cache.stats()["evictions"] == 1
+
+def test_disk_cache_index_survives_restart(tmp_path):
+    DiskLRUCache("test_disk_restart", str(tmp_path), max_bytes=100).put("a", b"aaaa")
+    cache = DiskLRUCache("test_disk_restart", str(tmp_path), max_bytes=100)
+    assert cache.get("a") is not None
+    assert cache.stats()["bytes"] == 4
+
+def test_disk_cache_read_survives_eviction(tmp_path):
+    cache = DiskLRUCache("test_disk_read", str(tmp_path), max_bytes=4)
+    cache.put("a", b"aaaa")
+    assert cache.read("a") == b"aaaa"
+    cache.put("b", b"bbbb") # Evicts "a"
+    assert cache.read("a") is None
+    os.remove(tmp_path / "b") # Removed by another process
+    assert cache.read("b") is None
+    assert cache.stats()["bytes"] == 0
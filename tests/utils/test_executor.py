@@ -0,0 +1,46 @@
+import asyncio
+import threading
+import pytest
+from app.utils.executor import BoundedExecutor, ExecutorSaturatedError, executors
+
+def test_executor_runs_jobs_and_counts_them():
+    pool = BoundedExecutor("test_basic", max_workers=2, max_queue=2)
+    assert asyncio.run(pool.run(pow, 2, 10)) == 1024
+    stats = pool.stats()
+    assert stats["completed"] == 1
+    assert stats["in_flight"] == 0
+    assert executors["test_basic"] is pool
+    pool.shutdown()
+
+def test_executor_rejects_jobs_beyond_queue_depth():
+    pool = BoundedExecutor("test_saturated", max_workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def scenario():
+        running = asyncio.ensure_future(pool.run(release.wait))
+        queued = asyncio.ensure_future(pool.run(release.wait))
+        await asyncio.sleep(0.01)
+        with pytest.raises(ExecutorSaturatedError):
+            await pool.run(release.wait)
+        release.set()
+        await asyncio.gather(running, queued)
+
+    asyncio.run(scenario())
+    assert pool.stats()["rejected"] == 1
+    assert pool.stats()["completed"] == 2
+    pool.shutdown()
+
+def test_executor_job_timeout():
+    pool = BoundedExecutor("test_timeout", max_workers=1, max_queue=0)
+    release = threading.Event()
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(pool.run(release.wait, timeout=0.01))
+    release.set()
+    assert pool.stats()["timed_out"] == 1
+    pool.shutdown()
+
+def test_process_executor_runs_module_level_functions():
+    pool = BoundedExecutor("test_process", kind="process", max_workers=1, max_queue=1, timeout=30)
+    assert asyncio.run(pool.run(pow, 3, 4)) == 81
+    assert pool.stats()["avg_job_ms"] is not None
+    pool.shutdown()
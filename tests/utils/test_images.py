@@ -0,0 +1,45 @@
+import base64
+import hashlib
+import io
+import pytest
+from PIL import Image
+from app.utils.images import render_derivatives, transcode_to_jpeg
+
+def make_png(width, height):
+    buffer = io.BytesIO()
+    Image.new("RGBA", (width, height), (255, 0, 0, 128)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def test_render_derivatives_sizes_and_formats():
+    main, derivatives, placeholder = render_derivatives(make_png(1000, 500), [96, 320, 1600], ["jpeg", "webp"])
+    assert Image.open(io.BytesIO(main)).format == "JPEG"
+    assert set(derivatives) == {"jpeg", "webp"}
+    assert set(derivatives["webp"]) == {96, 320} # 1600 would upscale
+    thumb = Image.open(io.BytesIO(derivatives["webp"][320]))
+    assert thumb.format == "WEBP"
+    assert thumb.size == (320, 160)
+    assert placeholder is None
+
+def test_render_derivatives_placeholder():
+    _, _, placeholder = render_derivatives(make_png(1000, 500), [320], ["webp"], placeholder_size=16)
+    header, payload = placeholder.split(",", 1)
+    assert header == "data:image/webp;base64"
+    assert len(placeholder) < 400
+    assert Image.open(io.BytesIO(base64.b64decode(payload))).size == (16, 8)
+
+def test_transcode_rejects_non_images():
+    with pytest.raises(ValueError):
+        transcode_to_jpeg(b"not an image")
+
+def test_hash_upload_reads_from_the_start():
+    from app.utils.images import hash_upload
+    source = io.BytesIO(b"x" * 10)
+    source.seek(5)
+    assert hash_upload(source, chunk_size=4) == hashlib.sha256(b"x" * 10).hexdigest()
+    assert source.tell() == 0
+
+def test_large_jpeg_is_capped_while_decoding(tmp_path):
+    path = tmp_path / "big.jpg"
+    Image.new("RGB", (4000, 2000), (0, 90, 0)).save(path, format="JPEG")
+    main, _, _ = render_derivatives(str(path), [], [], max_dimension=1000)
+    assert Image.open(io.BytesIO(main)).size == (1000, 500)
@@ -0,0 +1,64 @@
+import pytest
+from starlette.applications import Starlette
+from starlette.routing import Mount
+from starlette.testclient import TestClient
+
+from app.core.media_files import MediaFiles, RangeNotSatisfiable, parse_range
+
+DIGEST = "ab" * 32
+
+@pytest.fixture
+def media_client(tmp_path):
+    (tmp_path / f"{DIGEST}-320w.jpg").write_bytes(b"J" * 100)
+    (tmp_path / f"{DIGEST}-320w.webp").write_bytes(b"W" * 60)
+    (tmp_path / "logo.svg").write_bytes(b"<svg/>")
+    (tmp_path / "logo.svg.br").write_bytes(b"br")
+    app = Starlette(routes=[Mount("/media", MediaFiles(directory=str(tmp_path), immutable_max_age=3600))])
+    return TestClient(app)
+
+def test_parse_range():
+    assert parse_range("bytes=0-9", 100) == (0, 9)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=50-500", 100) == (50, 99)
+    assert parse_range("bytes=0-1,5-6", 100) is None
+    assert parse_range("items=0-1", 100) is None
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range("bytes=100-", 100)
+
+def test_content_addressed_files_are_immutable_and_negotiated(media_client):
+    url = f"/media/{DIGEST}-320w.jpg"
+    response = media_client.get(url, headers={"Accept": "image/avif,image/webp,*/*;q=0.8"})
+    assert response.headers["content-type"] == "image/webp"
+    assert response.content == b"W" * 60
+    assert response.headers["cache-control"] == "public, max-age=3600, immutable"
+    assert response.headers["vary"] == "Accept"
+
+    response = media_client.get(url, headers={"Accept": "*/*"})
+    assert response.headers["content-type"] == "image/jpeg"
+    etag = response.headers["etag"]
+    assert etag == f'"{DIGEST}-320w.jpg"'
+
+    assert media_client.get(url, headers={"If-None-Match": etag}).status_code == 304
+    # If-None-Match wins over If-Modified-Since
+    response = media_client.get(url, headers={"If-None-Match": '"other"', "If-Modified-Since": "Fri, 01 Jan 2100 00:00:00 GMT"})
+    assert response.status_code == 200
+
+def test_range_requests(media_client):
+    url = f"/media/{DIGEST}-320w.jpg"
+    response = media_client.get(url, headers={"Range": "bytes=10-19"})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == "bytes 10-19/100"
+    assert response.content == b"J" * 10
+
+    assert media_client.get(url, headers={"Range": "bytes=200-"}).status_code == 416
+    # A stale If-Range sends the whole file
+    response = media_client.get(url, headers={"Range": "bytes=10-19", "If-Range": '"stale"'})
+    assert response.status_code == 200
+    assert len(response.content) == 100
+
+def test_precompressed_variant(media_client):
+    response = media_client.get("/media/logo.svg", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["content-encoding"] == "br"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert "cache-control" not in response.headers
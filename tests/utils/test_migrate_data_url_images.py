@@ -0,0 +1,17 @@
+import base64
+import pytest
+from app.utils.migrate_data_url_images import decode_data_url, load_checkpoint, save_checkpoint
+
+def test_decode_data_url():
+    data_url = "data:image/jpeg;base64," + base64.b64encode(b"jpeg bytes").decode()
+    assert decode_data_url(data_url) == b"jpeg bytes"
+    with pytest.raises(ValueError):
+        decode_data_url("https://example.com/a.jpg")
+    with pytest.raises(ValueError):
+        decode_data_url("data:image/jpeg;base64,not base64!")
+
+def test_checkpoint_round_trip(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    assert load_checkpoint(path)["last_id"] == 0
+    save_checkpoint(path, {"last_id": 42, "migrated": 40, "failed": [{"id": 7, "error": "bad"}]})
+    assert load_checkpoint(path)["last_id"] == 42
@@ -0,0 +1,28 @@
+import pytest
+from datetime import datetime
+from app.utils.pagination import encode_cursor, decode_cursor
+
+def test_cursor_round_trip():
+    values = [19.99, "Name", datetime(2024, 5, 1, 12, 30), 42]
+    cursor = encode_cursor("price", values)
+    assert decode_cursor(cursor, "price") == values
+
+def test_cursor_is_url_safe():
+    cursor = encode_cursor("-id", [123456789])
+    assert all(c.isalnum() or c in "-_" for c in cursor)
+
+def test_cursor_for_other_sort_is_rejected():
+    cursor = encode_cursor("-id", [10])
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, "price")
+
+@pytest.mark.parametrize("cursor", ["garbage", "e30", "!!!", ""])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, "-id")
+
+@pytest.mark.parametrize("values", [[[1, 2]], [{"a": 1}], [{"dt": 5}], [{"dt": "not a date"}]])
+def test_cursor_with_non_scalar_values_is_rejected(values):
+    cursor = encode_cursor("-id", values)
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, "-id")
@@ -0,0 +1,25 @@
+from app.utils.cache import caches
+from app.utils.search import SearchIndex, indexes, tokenize
+
+def test_tokenize_folds_accents():
+    assert tokenize("Camiseta Básica-XL, Ñandú") == ["camiseta", "basica", "xl", "nandu"]
+
+def test_search_ranks_with_field_weights_and_updates_incrementally():
+    index = SearchIndex("test_search", weights={"name": 3.0, "description": 1.0})
+    assert indexes["test_search"] is index and "test_search" not in caches
+    index.add(1, {"name": "Mesa de roble", "description": "Madera maciza"}, {"status": "active"})
+    index.add(2, {"name": "Silla", "description": "Hace juego con la mesa de roble"}, {"status": "draft"})
+    index.add(3, {"name": "Lámpara", "description": None}, {"status": "active"})
+
+    assert [doc_id for doc_id, _ in index.search("MESA")] == [1, 2] # Name match first
+    assert [doc_id for doc_id, _ in index.search("lampara")] == [3]
+    assert [doc_id for doc_id, _ in index.search("mesa", accept=lambda a: a["status"] == "draft")] == [2]
+
+    index.add(1, {"name": "Mesa auxiliar"}, {"status": "active"}) # Replaces the previous version
+    assert index.search("roble")[0][0] == 2
+    index.remove(2)
+    assert index.search("roble") == []
+    assert index.stats()["size"] == 2
+
+    index.rebuild([(7, {"name": "Sofá"}, {})])
+    assert [doc_id for doc_id, _ in index.search("sofa mesa")] == [7]
@@ -0,0 +1,24 @@
+import pytest
+from app.utils.storage import LocalStorage, content_key
+
+def test_local_storage_content_addressed_save(tmp_path):
+    storage = LocalStorage(str(tmp_path), "/media")
+    key = storage.save_content(b"jpeg bytes", extension="jpg")
+    assert key == content_key(b"jpeg bytes", extension="jpg")
+    assert key.startswith("images/") and key.endswith(".jpg")
+    assert storage.open(key) == b"jpeg bytes"
+    assert storage.save_content(b"jpeg bytes", extension="jpg") == key # Same content, same key
+
+    url = storage.url(key)
+    assert url == f"/media/{key}"
+    assert storage.key_from_url(url) == key
+    assert storage.key_from_url("https://example.com/a.jpg") is None
+
+    storage.delete(key)
+    assert not storage.exists(key)
+    storage.delete(key) # Missing keys are ignored
+
+def test_local_storage_rejects_keys_outside_root(tmp_path):
+    storage = LocalStorage(str(tmp_path), "/media")
+    with pytest.raises(ValueError):
+        storage.save(b"x", key="../outside.txt")
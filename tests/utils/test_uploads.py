@@ -0,0 +1,48 @@
+import os
+
+import inspect
+
+from fastapi import APIRouter, FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+from starlette.datastructures import Headers
+from starlette.formparsers import MultiPartParser
+from starlette.requests import Request
+
+from app.core.config import settings
+from app.core.uploads import UploadRoute
+
+router = APIRouter(route_class=UploadRoute)
+seen_paths = []
+
+@router.post("/upload")
+async def upload(image: UploadFile = File(...)):
+    seen_paths.append(image.file.name)
+    with open(image.file.name, "rb") as f:
+        return {"size": image.size, "content": f.read().decode()}
+
+app = FastAPI()
+app.include_router(router)
+client = TestClient(app)
+
+def test_files_are_written_to_named_temp_files(monkeypatch):
+    monkeypatch.setattr(settings, "IMAGE_MAX_UPLOAD_BYTES", 10)
+    response = client.post("/upload", files={"image": ("a.jpg", b"x" * 10, "image/jpeg")})
+    assert response.json() == {"size": 10, "content": "x" * 10}
+    assert not os.path.exists(seen_paths[-1]) # Deleted with the form once the response is sent
+
+def test_oversized_file_is_refused_while_received(monkeypatch):
+    monkeypatch.setattr(settings, "IMAGE_MAX_UPLOAD_BYTES", 10)
+    response = client.post("/upload", files={"image": ("a.jpg", b"x" * 11, "image/jpeg")})
+    assert response.status_code == 413
+
+async def empty_stream():
+    yield b""
+
+def test_starlette_internals_used_by_the_upload_parser_exist():
+    # UploadMultiPartParser/UploadRequest extend these; a Starlette upgrade that moves them must fail here
+    assert {"on_headers_finished", "on_part_data", "parse"} <= set(vars(MultiPartParser))
+    parser = MultiPartParser(Headers({"content-type": "multipart/form-data; boundary=x"}), empty_stream())
+    assert isinstance(parser._files_to_close_on_error, list)
+    assert hasattr(parser._current_part, "file")
+    assert set(inspect.signature(Request._get_form).parameters) == {"self", "max_files", "max_fields"}
+    assert Request({"type": "http", "headers": []})._form is None # Set by UploadRequest before delegating